@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Content-addressed cache of Rasch analysis results
+The key is a hash of the test's answer key and its submissions, so a
+repeated request with unchanged data is served from memory or disk and
+a new submission changes the key of that test only. Entries are kept in
+a small in-memory LRU and on disk with a total size limit.
+"""
+
+import hashlib
+import logging
+import os
+import pickle
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+# Bump when the analysis output changes so old entries are not reused
+ANALYSIS_VERSION = 4
+
+# Results kept in memory
+MEMORY_ENTRIES = int(os.getenv('ANALYSIS_CACHE_ENTRIES', '16'))
+
+# Total size of cached results on disk
+DISK_LIMIT = int(float(os.getenv('ANALYSIS_CACHE_MAX_MB', '200')) * 1024 * 1024)
+
+
+def analysis_key(answer_key: str, registrations: dict) -> str:
+    """Hash of everything the analysis of one test depends on"""
+    digest = hashlib.sha256(f"v{ANALYSIS_VERSION}\0{answer_key}\0".encode('utf-8'))
+    for user_id in sorted(registrations):
+        user_data = registrations[user_id]
+        if user_data.get('answers'):
+            digest.update(
+                f"{user_id}\0{user_data['name']}\0{user_data['surname']}\0{user_data['answers']}\n"
+                .encode('utf-8')
+            )
+    return digest.hexdigest()[:32]
+
+
+class AnalysisCache:
+    """Memory + disk cache of (result_df, items_info, png_bytes) per test"""
+
+    def __init__(self, directory: str, memory_entries: int = MEMORY_ENTRIES, disk_limit: int = DISK_LIMIT):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.memory_entries = memory_entries
+        self.disk_limit = disk_limit
+        self._memory = OrderedDict()  # (test_id, key) -> result
+
+    @staticmethod
+    def _test_prefix(test_id) -> str:
+        """File name prefix of a test (test ids are free text, so hash them)"""
+        return hashlib.sha1(str(test_id).encode('utf-8')).hexdigest()[:12] + "-"
+
+    def _path(self, test_id, key: str) -> str:
+        """Disk file of an entry"""
+        return os.path.join(self.directory, f"{self._test_prefix(test_id)}{key}.pkl")
+
+    def get(self, test_id, key: str):
+        """Return cached result or None"""
+        result = self._memory.get((test_id, key))
+        if result is not None:
+            self._memory.move_to_end((test_id, key))
+            return result
+
+        path = self._path(test_id, key)
+        try:
+            with open(path, 'rb') as f:
+                result = pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.error(f"Damaged analysis cache entry {path}: {e}")
+            os.remove(path)
+            return None
+
+        os.utime(path)  # mark as recently used for eviction
+        self._remember(test_id, key, result)
+        return result
+
+    def put(self, test_id, key: str, result: tuple):
+        """Store result, replacing older entries of the same test"""
+        self._drop_test(test_id)
+        self._remember(test_id, key, result)
+
+        path = self._path(test_id, key)
+        try:
+            with open(f"{path}.tmp", 'wb') as f:
+                pickle.dump(result, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(f"{path}.tmp", path)
+        except OSError as e:
+            logger.error(f"Error saving analysis cache entry {path}: {e}")
+            return
+        self._evict()
+
+    def _remember(self, test_id, key: str, result: tuple):
+        """Add to the in-memory LRU"""
+        self._memory[(test_id, key)] = result
+        self._memory.move_to_end((test_id, key))
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def _drop_test(self, test_id):
+        """Remove every entry of a test"""
+        for cached in [cached for cached in self._memory if cached[0] == test_id]:
+            del self._memory[cached]
+        prefix = self._test_prefix(test_id)
+        for name in os.listdir(self.directory):
+            if name.startswith(prefix) and name.endswith('.pkl'):
+                os.remove(os.path.join(self.directory, name))
+
+    def _evict(self):
+        """Delete least recently used files until the disk limit is met"""
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith('.pkl'):
+                stat = os.stat(os.path.join(self.directory, name))
+                entries.append((stat.st_mtime, stat.st_size, name))
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total <= self.disk_limit:
+                break
+            os.remove(os.path.join(self.directory, name))
+            total -= size
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Rasch analysis and chart rendering
+Heavy pandas / matplotlib work; runs in the analytics worker processes.
+"""
+
+import logging
+import pandas as pd
+import io
+
+from grading import grade_test
+import rasch
+import charts
+
+logger = logging.getLogger(__name__)
+
+
+# Rasch Analysis Functions
+def perform_rasch_analysis(test_id: str, registrations: dict, tests: dict) -> tuple:
+    """
+    Perform Rasch analysis on test results
+    Returns: (result_df, items_info_df, graph_buffer)
+    """
+    try:
+        # Binary response matrix (1=correct, 0=wrong) for all submissions
+        test_registrations = registrations[test_id]
+        graded = grade_test(
+            tests[test_id]['answers'],
+            {user_id: user_data['answers'] for user_id, user_data in test_registrations.items()}
+        )
+        
+        if not graded.user_ids:
+            return None, None, None
+        
+        num_questions = graded.num_questions
+        user_ids = [
+            f"{test_registrations[user_id]['name']} {test_registrations[user_id]['surname']}"
+            for user_id in graded.user_ids
+        ]
+        
+        # Create DataFrame
+        df = pd.DataFrame(graded.responses, index=user_ids, 
+                         columns=[f"S{i+1}" for i in range(num_questions)])
+        
+        # Rasch measures (JML estimate of item difficulty and person ability)
+        measures = rasch.estimate(graded.responses)
+        if not measures.converged:
+            logger.warning(f"Rasch estimation for test #{test_id} did not converge")
+        difficulty_logits = pd.Series(measures.item_difficulty, index=df.columns)
+        
+        # Item weights (1.0 to 4.0)
+        min_l, max_l = difficulty_logits.min(), difficulty_logits.max()
+        if max_l == min_l:
+            item_weights = pd.Series(2.5, index=df.columns)
+        else:
+            item_weights = (difficulty_logits - min_l) / (max_l - min_l) * 3.0 + 1.0
+        
+        # Calculate scores
+        raw_weighted_scores = df.dot(item_weights)
+        max_possible_raw = item_weights.sum()
+        target_max = 90.5
+        p = 0.75
+        final_scores = ((raw_weighted_scores / max_possible_raw) ** p) * target_max
+        rounded_scores = final_scores.round(2)
+        
+        # Certificate levels
+        def get_certificate(score):
+            if score >= 70: return "A+"
+            elif 65 <= score < 70: return "A"
+            elif 60 <= score < 65: return "B+"
+            elif 55 <= score < 60: return "B"
+            elif 50 <= score < 55: return "C+"
+            elif 46 <= score < 50: return "C"
+            else: return "Sertifikat berilmaydi"
+        
+        # Results DataFrame
+        result_df = pd.DataFrame({
+            'Ishtirokchi': user_ids,
+            'Togri_Javoblar': df.sum(axis=1),
+            'Rasch_Ball_90.5': rounded_scores,
+            'Sertifikat': rounded_scores.apply(get_certificate),
+            'Qobiliyat_logit': measures.person_ability.round(3),
+            'Qobiliyat_SE': measures.person_se.round(3),
+            'Infit': measures.person_infit.round(2),
+            'Outfit': measures.person_outfit.round(2)
+        })
+        result_df.index = pd.Index(graded.user_ids, name='user_id')
+        
+        # Items info for graph
+        items_info = pd.DataFrame({
+            'Savol': df.columns,
+            'Savol_Bali': item_weights.values.round(2),
+            'Qiyinlik_logit': measures.item_difficulty.round(3),
+            'Qiyinlik_SE': measures.item_se.round(3),
+            'Infit': measures.item_infit.round(2),
+            'Outfit': measures.item_outfit.round(2)
+        }).sort_values(by='Savol_Bali', ascending=True)
+        
+        # Create graph
+        buf = io.BytesIO(charts.render_difficulty_chart(test_id, items_info['Savol'], items_info['Savol_Bali']))
+        
+        return result_df, items_info, buf
+        
+    except Exception as e:
+        logger.error(f"Rasch analysis error: {e}")
+        return None, None, None
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Process pool for analytics jobs
+Rasch analysis and chart rendering run in worker processes so they never
+block the bot's event loop. Workers import pandas / matplotlib once when
+they start. The pool is created by the first job, or ahead of time by
+start() when the bot pre-warms it (ANALYTICS_PREWARM).
+"""
+
+import asyncio
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+logger = logging.getLogger(__name__)
+
+# Number of analytics worker processes
+ANALYTICS_WORKERS = int(os.getenv('ANALYTICS_WORKERS', '1'))
+
+# Seconds an analytics job may run
+ANALYTICS_TIMEOUT = float(os.getenv('ANALYTICS_TIMEOUT', '120'))
+
+
+class AnalyticsUnavailable(Exception):
+    """A job was lost with its worker (the worker died or the pool was restarted), it can be retried"""
+
+
+def _init_worker():
+    """Import the analytics stack once per worker process"""
+    import analytics  # noqa: F401
+
+
+def _warm_up():
+    """No-op job used to start workers ahead of time"""
+    return os.getpid()
+
+
+def _run_job(name: str, args: tuple):
+    """Run analytics.<name>(*args) inside a worker"""
+    import analytics
+    return getattr(analytics, name)(*args)
+
+
+class AnalyticsPool:
+    """ProcessPoolExecutor wrapper with warm-up and per-job timeout"""
+
+    def __init__(self, workers: int = ANALYTICS_WORKERS, timeout: float = ANALYTICS_TIMEOUT):
+        self.workers = workers
+        self.timeout = timeout
+        self._executor = None
+
+    def start(self):
+        """Create the pool and start every worker"""
+        if self._executor is not None:
+            return
+        self._executor = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker)
+        for _ in range(self.workers):
+            self._executor.submit(_warm_up)
+        logger.info(f"Analytics pool started with {self.workers} worker(s)")
+
+    async def run(self, name: str, *args):
+        """
+        Run analytics.<name>(*args) in a worker
+        Raises asyncio.TimeoutError when the job takes too long, and
+        AnalyticsUnavailable when its worker died or another job's timeout
+        restarted the pool. A new pool is started in both cases.
+        """
+        if self._executor is None:
+            self.start()
+        loop = asyncio.get_running_loop()
+        executor = self._executor
+        try:
+            future = loop.run_in_executor(executor, _run_job, name, args)
+        except BrokenProcessPool:
+            # A worker died since the last job, submit to a new pool
+            logger.error("Analytics pool is broken, restarting it")
+            self._restart(executor)
+            executor = self._executor
+            future = loop.run_in_executor(executor, _run_job, name, args)
+
+        try:
+            return await asyncio.wait_for(future, timeout=self.timeout)
+        except asyncio.TimeoutError:
+            logger.error(f"Analytics job {name} timed out after {self.timeout}s, restarting pool")
+            self._restart(executor)
+            raise
+        except BrokenProcessPool as e:
+            logger.error(f"Analytics worker died during {name}, restarting pool")
+            self._restart(executor)
+            raise AnalyticsUnavailable(f"analytics worker died: {e}") from e
+        except asyncio.CancelledError:
+            if asyncio.current_task().cancelling():
+                raise
+            # Queued job dropped by the restart after another job's timeout
+            raise AnalyticsUnavailable("analytics pool was restarted") from None
+
+    def _restart(self, executor):
+        """Replace a failed pool by a new one (once, however many of its jobs noticed)"""
+        if self._executor is executor:
+            self.shutdown(terminate=True)
+            self.start()
+
+    def shutdown(self, terminate: bool = False):
+        """Stop worker processes (terminate=True also kills a worker stuck in a job)"""
+        if self._executor is not None:
+            # shutdown() drops the executor's process table, keep it for terminate()
+            processes = list((self._executor._processes or {}).values())
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+            if terminate:
+                for process in processes:
+                    process.terminate()
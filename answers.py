@@ -0,0 +1,23 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Answer string parsing
+Pure Python, so the bot can count questions at startup without loading
+NumPy (the grading engine is imported on first use).
+"""
+
+# Every byte that is not an ASCII letter (removed from ASCII answers)
+_NON_LETTERS = bytes(c for c in range(256) if not (65 <= c <= 90 or 97 <= c <= 122))
+
+
+def answer_letters(answers: str) -> str:
+    """Keep only the answer letters: '1A 2b3c' -> 'abc'"""
+    if answers.isascii():
+        return answers.lower().encode('ascii').translate(None, _NON_LETTERS).decode('ascii')
+    # Any alphabet (e.g. Cyrillic keys), every letter keeps its own code point
+    return ''.join(c for c in answers.lower() if c.isalpha())
+
+
+def count_questions(answers: str) -> int:
+    """Number of answer letters in an answer string"""
+    return len(answer_letters(answers))
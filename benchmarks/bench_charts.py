@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark: Rasch difficulty chart, pyplot + seaborn vs charts.py
+Usage: python benchmarks/bench_charts.py [items] [repeats]
+"""
+
+import io
+import os
+import sys
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import matplotlib
+matplotlib.use('Agg')
+import numpy as np
+import pandas as pd
+
+import charts
+
+
+def render_pyplot(test_id, items_info) -> bytes:
+    """The previous renderer from perform_rasch_analysis"""
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+
+    plt.figure(figsize=(12, 6))
+    sns.set_style("white")
+    palette = sns.color_palette("Blues_d", len(items_info))
+    ax = sns.barplot(x='Savol', y='Savol_Bali', hue='Savol', data=items_info, palette=palette, legend=False)
+    plt.title(f'Test #{test_id} - Savollar Qiyinlik Darajasi (Rasch Analysis)',
+              fontsize=14, fontweight='bold', pad=15)
+    plt.xlabel('Savollar', fontsize=11, fontweight='bold')
+    plt.ylabel('Ball (1.0 - 4.0)', fontsize=11, fontweight='bold')
+    plt.xticks(rotation=45, ha='right')
+    plt.ylim(0, 4.5)
+    for p in ax.patches:
+        ax.annotate(format(p.get_height(), '.2f'),
+                    (p.get_x() + p.get_width() / 2., p.get_height()),
+                    ha='center', va='center', xytext=(0, 8), textcoords='offset points',
+                    fontsize=9, fontweight='bold', color='black')
+    sns.despine()
+    plt.tight_layout()
+    buf = io.BytesIO()
+    plt.savefig(buf, format='png', dpi=150, bbox_inches='tight')
+    plt.close()
+    return buf.getvalue()
+
+
+def render_charts(test_id, items_info) -> bytes:
+    """The object-oriented renderer"""
+    return charts.render_difficulty_chart(test_id, items_info['Savol'], items_info['Savol_Bali'])
+
+
+def measure(name, render, items_info, repeats):
+    """Time and peak memory of repeated renders"""
+    render('warmup', items_info)
+    tracemalloc.start()
+    start = time.perf_counter()
+    for i in range(repeats):
+        render(i, items_info)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{name:<22} {elapsed / repeats * 1000:8.1f} ms/chart   peak {peak / 1024 / 1024:6.1f} MB")
+    return elapsed / repeats
+
+
+def main():
+    items = int(sys.argv[1]) if len(sys.argv) > 1 else 30
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+
+    rng = np.random.default_rng(0)
+    items_info = pd.DataFrame({
+        'Savol': [f"S{i + 1}" for i in range(items)],
+        'Savol_Bali': rng.uniform(1, 4, items).round(2),
+    }).sort_values(by='Savol_Bali')
+
+    print(f"{items} items, {repeats} renders each")
+    try:
+        old = measure("pyplot + seaborn", render_pyplot, items_info, repeats)
+    except ImportError:
+        old = None
+        print("pyplot + seaborn       (seaborn not installed, skipped)")
+    new = measure("charts.py", render_charts, items_info, repeats)
+    if old:
+        print(f"speedup: {old / new:.1f}x")
+
+    # charts.py keeps no global state, so threads can render at the same time
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        start = time.perf_counter()
+        images = list(pool.map(lambda i: render_charts(i, items_info), range(repeats)))
+        elapsed = time.perf_counter() - start
+    assert all(image.startswith(b'\x89PNG') for image in images)
+    print(f"charts.py, 4 threads   {elapsed / repeats * 1000:8.1f} ms/chart")
+
+
+if __name__ == '__main__':
+    main()
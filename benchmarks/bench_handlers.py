@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark suite for the bot's hot paths
+Builds synthetic bot_data (users, tests and one large test every user has
+answered) at several sizes and times, with stubbed Update / context / bot:
+
+  show_main_menu           main menu from the catalog
+  handle_message_invalid   answer validation rejecting a wrong answer count
+  handle_message_submit    accepted answers (writer + journal) and the menu
+  grade_and_deliver        grading of the large test, scores and ranking
+                           (the broadcaster is stubbed, nothing is sent)
+  perform_rasch_analysis   Rasch analysis and chart of the large test
+
+Each size runs in its own interpreter. Reports ops/s and the peak memory
+traced during one call, and compares them with benchmarks/baseline.json:
+the run fails if a result is more than --tolerance slower or larger.
+Baselines are machine specific; refresh them with --save-baseline.
+
+Usage: python benchmarks/bench_handlers.py [--sizes 1000,10000,100000]
+           [--backend json|sqlite] [--tolerance 0.3] [--save-baseline]
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from types import SimpleNamespace
+
+REPO_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+
+SIZES = (1_000, 10_000, 100_000)
+QUESTIONS = 50
+TESTS = 10
+LARGE_TEST = '1'
+
+BENCHMARKS = (
+    'show_main_menu',
+    'handle_message_invalid',
+    'handle_message_submit',
+    'grade_and_deliver',
+    'perform_rasch_analysis',
+)
+
+# Seconds each benchmark is repeated for (at least one call)
+MIN_TIME = 1.0
+
+
+# Synthetic data
+def build_data(data_dir: str, users: int, backend: str):
+    """Write users, tests and registrations of the given size to data_dir"""
+    sys.path.insert(0, REPO_DIR)
+    from storage import save_data
+
+    rng = random.Random(users)
+    letters = 'abcd'
+    os.makedirs(data_dir, exist_ok=True)
+
+    tests = {
+        str(i): {
+            'answers': ''.join(rng.choice(letters) for _ in range(QUESTIONS)),
+            'deadline': '2099-01-01 00:00:00',
+            'check_time': '2099-01-02 00:00:00',
+            'created_at': '2026-01-01 00:00:00',
+        }
+        for i in range(1, TESTS + 1)
+    }
+    key = tests[LARGE_TEST]['answers']
+
+    user_records = {}
+    registrations = {test_id: {} for test_id in tests}
+    for user_id in range(1, users + 1):
+        user_records[str(user_id)] = {
+            'name': f"Ism{user_id}", 'surname': "Familiya", 'username': None,
+            'registered_at': '2026-01-01 00:00:00',
+        }
+        ability = rng.random()
+        answers = ''.join(c if rng.random() < ability else rng.choice(letters) for c in key)
+        registrations[LARGE_TEST][str(user_id)] = {
+            'registered_at': '2026-01-01 00:00:00', 'answers': answers, 'score': None,
+            'submitted_at': '2026-01-01 00:00:00',
+        }
+
+    save_data(os.path.join(data_dir, 'users.json'), user_records)
+    save_data(os.path.join(data_dir, 'tests.json'), tests)
+    save_data(os.path.join(data_dir, 'registrations.json'), registrations)
+
+    if backend == 'sqlite':
+        from migrate_to_sqlite import migrate
+        migrate(data_dir)
+
+
+# Stubs
+class StubMessage:
+    """Message with a text and a no-op reply_text"""
+
+    def __init__(self, text: str):
+        self.text = text
+
+    async def reply_text(self, text, **kwargs):
+        return None
+
+
+class StubBot:
+    """Bot whose API calls return immediately"""
+
+    async def get_chat_member(self, chat_id, user_id):
+        return SimpleNamespace(status='member')
+
+    async def send_message(self, **kwargs):
+        return None
+
+
+class StubBroadcaster:
+    """Broadcaster that counts deliveries without sending them"""
+
+    async def send(self, broadcast_id, deliveries, progress=None):
+        return {'total': len(deliveries), 'sent': len(deliveries), 'failed': 0, 'skipped': 0}
+
+
+def make_update(user_id: int, text: str):
+    """Update with a text message from a user"""
+    return SimpleNamespace(
+        message=StubMessage(text),
+        callback_query=None,
+        effective_user=SimpleNamespace(id=user_id),
+    )
+
+
+def make_context(user_data: dict = None):
+    """Handler context with a stub bot"""
+    return SimpleNamespace(bot=StubBot(), user_data=user_data or {}, args=[], job_queue=None)
+
+
+# Measurement
+async def measure(call) -> dict:
+    """ops/s over MIN_TIME and peak traced memory (MB) of one call"""
+    await call()  # warm up caches
+
+    runs = 0
+    start = time.perf_counter()
+    while runs == 0 or time.perf_counter() - start < MIN_TIME:
+        await call()
+        runs += 1
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    await call()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return {'ops_per_s': round(runs / elapsed, 2), 'peak_mb': round(peak / 1024 / 1024, 2)}
+
+
+async def run_benchmarks(users: int) -> dict:
+    """Time every benchmark against the bot module (bot_data in the current directory)"""
+    import telegram_bot as bot
+    import analytics
+    from catalog import REFRESH_BUTTON
+
+    bot.broadcaster = StubBroadcaster()
+    await bot.writer.start()
+
+    key = bot.store.get_test(LARGE_TEST)['answers']
+    user_ids = iter(range(1, 10 ** 9))
+
+    async def show_main_menu():
+        await bot.show_main_menu(make_update(1, REFRESH_BUTTON), make_context())
+
+    async def handle_message_invalid():
+        await bot.handle_message(make_update(1, key[:-1]), make_context({'selected_test': LARGE_TEST}))
+
+    async def handle_message_submit():
+        user_id = next(user_ids) % users + 1
+        await bot.handle_message(make_update(user_id, key), make_context({'selected_test': LARGE_TEST}))
+
+    async def grade_and_deliver():
+        await bot.grade_and_deliver(StubBot(), LARGE_TEST)
+
+    async def perform_rasch_analysis():
+        analytics.perform_rasch_analysis(
+            LARGE_TEST, {LARGE_TEST: bot.analysis_snapshot(LARGE_TEST)}, bot.store.get_tests()
+        )
+
+    calls = {
+        'show_main_menu': show_main_menu,
+        'handle_message_invalid': handle_message_invalid,
+        'handle_message_submit': handle_message_submit,
+        'grade_and_deliver': grade_and_deliver,
+        'perform_rasch_analysis': perform_rasch_analysis,
+    }
+    results = {name: await measure(calls[name]) for name in BENCHMARKS}
+    await bot.writer.stop()
+    bot.store.close()
+    return results
+
+
+def worker(users: int, backend: str):
+    """Build data for one size in a temporary directory and print the results as JSON"""
+    logging.disable(logging.INFO)
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        build_data(os.path.join(tmp, 'bot_data'), users, backend)
+        sys.path.insert(0, REPO_DIR)
+        results = asyncio.run(run_benchmarks(users))
+        os.chdir(REPO_DIR)
+    print(json.dumps(results))
+
+
+# Runner
+def run_size(users: int, backend: str) -> dict:
+    """Run the benchmarks of one size in a new interpreter"""
+    env = dict(os.environ, STORAGE_BACKEND=backend, BOT_TOKEN=os.getenv('BOT_TOKEN', '1:benchmark'))
+    result = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), '--worker', str(users), '--backend', backend],
+        env=env, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        sys.exit(f"Benchmark with {users} users failed:\n{result.stderr}")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """Regressions against the baseline as messages"""
+    regressions = []
+    for size, benchmarks in results.items():
+        for name, result in benchmarks.items():
+            base = baseline.get(size, {}).get(name)
+            if base is None:
+                continue
+            if result['ops_per_s'] < base['ops_per_s'] * (1 - tolerance):
+                regressions.append(f"{name} @ {size}: {result['ops_per_s']:.1f} ops/s "
+                                   f"(baseline {base['ops_per_s']:.1f})")
+            # Small allocations vary between runs, allow 1 MB on top of the tolerance
+            if result['peak_mb'] > base['peak_mb'] * (1 + tolerance) + 1:
+                regressions.append(f"{name} @ {size}: {result['peak_mb']:.1f} MB peak "
+                                   f"(baseline {base['peak_mb']:.1f})")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', default=','.join(map(str, SIZES)), help="numbers of users")
+    parser.add_argument('--backend', default='json', choices=('json', 'sqlite'))
+    parser.add_argument('--tolerance', type=float, default=0.3, help="allowed slowdown / growth")
+    parser.add_argument('--save-baseline', action='store_true', help="store these results as the baseline")
+    parser.add_argument('--worker', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker is not None:
+        worker(args.worker, args.backend)
+        return
+
+    results = {}
+    print(f"{'benchmark':<26} {'users':>8} {'ops/s':>12} {'peak MB':>9}")
+    for users in (int(size) for size in args.sizes.split(',')):
+        size = f"{args.backend}/{users}"
+        results[size] = run_size(users, args.backend)
+        for name, result in results[size].items():
+            print(f"{name:<26} {users:>8} {result['ops_per_s']:>12.1f} {result['peak_mb']:>9.1f}")
+
+    baseline = {}
+    if os.path.exists(BASELINE_FILE):
+        with open(BASELINE_FILE, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+
+    if args.save_baseline:
+        baseline.update(results)
+        with open(BASELINE_FILE, 'w', encoding='utf-8') as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+        print(f"\nBaseline saved to {BASELINE_FILE}")
+        return
+
+    regressions = compare(results, baseline, args.tolerance)
+    for regression in regressions:
+        print(f"REGRESSION: {regression}")
+    if not baseline:
+        print("\nNo baseline yet, run with --save-baseline")
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == '__main__':
+    main()
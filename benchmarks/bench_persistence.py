@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Conversation state persistence: StatePersistence vs. PTB's PicklePersistence
+Fills both with --users users (user_data and a registration conversation
+state each), then measures:
+
+  update   one persistence update in which --changed users changed
+           (PTB also passes the users whose data did not change)
+  load     startup: reading user_data and conversation states back
+
+PicklePersistence rewrites its whole file for every changed user;
+StatePersistence appends the changed entries to its log.
+
+Usage: python benchmarks/bench_persistence.py [--users 100000] [--changed 10]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from telegram.ext import PersistenceInput, PicklePersistence  # noqa: E402
+
+from state_persistence import StatePersistence  # noqa: E402
+
+CONVERSATION = 'registration'
+
+
+async def fill(persistence, users: int):
+    """user_data and a conversation state for every user, then write everything"""
+    for user_id in range(1, users + 1):
+        await persistence.update_user_data(user_id, {'selected_test': str(user_id % 20), 'name': f"Ism{user_id}"})
+        await persistence.update_conversation(CONVERSATION, (user_id, user_id), user_id % 4)
+    await persistence.flush()
+
+
+async def update_round(persistence, changed: int, touched: int) -> float:
+    """Seconds of one persistence update: changed users with new data, touched users without"""
+    start = time.perf_counter()
+    for user_id in range(1, touched + 1):
+        data = {'selected_test': str(user_id % 20), 'name': f"Ism{user_id}"}
+        if user_id <= changed:
+            data['selected_test'] = 'new'
+        await persistence.update_user_data(user_id, data)
+    for user_id in range(1, changed + 1):
+        await persistence.update_conversation(CONVERSATION, (user_id, user_id), 3)
+    await asyncio.sleep(0)  # StatePersistence commits the round after the updates
+    return time.perf_counter() - start
+
+
+async def load(make) -> float:
+    """Seconds from opening the files to having user_data and conversations"""
+    start = time.perf_counter()
+    persistence = make()
+    await persistence.get_user_data()
+    await persistence.get_conversations(CONVERSATION)
+    return time.perf_counter() - start
+
+
+async def run(users: int, changed: int):
+    with tempfile.TemporaryDirectory() as tmp:
+        def pickle_persistence(on_flush: bool = False):
+            return PicklePersistence(
+                os.path.join(tmp, 'pickle'), on_flush=on_flush,
+                store_data=PersistenceInput(bot_data=False, chat_data=False, callback_data=False)
+            )
+
+        def state_persistence(on_flush: bool = False):
+            return StatePersistence(os.path.join(tmp, 'state'))
+
+        print(f"{users} users, {changed} changed per update")
+        print(f"{'':<18} {'update ms':>10} {'load ms':>9} {'file KB':>8}")
+        for label, prefix, make in (('PicklePersistence', 'pickle', pickle_persistence),
+                                    ('StatePersistence', 'state', state_persistence)):
+            # Filled with one write at the end (PicklePersistence would rewrite its file per user)
+            await fill(make(on_flush=True), users)
+            persistence = make()
+            # PicklePersistence reads its file lazily, load it before timing the update
+            await persistence.get_user_data()
+            seconds = await update_round(persistence, changed, touched=changed * 2)
+            await persistence.flush()
+            load_seconds = await load(make)
+            size = sum(os.path.getsize(os.path.join(tmp, name)) for name in os.listdir(tmp)
+                       if name.startswith(prefix))
+            print(f"{label:<18} {seconds * 1000:>10.1f} {load_seconds * 1000:>9.1f} {size / 1024:>8.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--users', type=int, default=100_000)
+    parser.add_argument('--changed', type=int, default=10)
+    args = parser.parse_args()
+    asyncio.run(run(args.users, args.changed))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Multi-process mode: answer submissions with 1 vs N worker processes
+Builds synthetic bot_data in the SQLite store (as bench_handlers does) and
+runs handle_message_submit in N worker interpreters at the same time, each
+for the users of its shard (user_id % N), all writing to one database.
+Reports per worker count:
+
+  ops/s     accepted submissions per second across all workers
+  speedup   ops/s relative to one worker
+  stall ms  longest event loop stall seen in any worker (a worker waiting
+            for the SQLite write lock must not freeze its loop)
+
+Workers compete for CPU cores, so the speedup is bounded by os.cpu_count().
+
+Usage: python benchmarks/bench_shards.py [--workers 1,2,4] [--users 10000]
+           [--duration 5]
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_handlers import LARGE_TEST, REPO_DIR, build_data, make_context, make_update  # noqa: E402
+
+# Seconds the workers get to import the bot before the common start time
+STARTUP_TIME = 5.0
+
+# Event loop stall probe interval
+PROBE_INTERVAL = 0.005
+
+
+async def submit_loop(index: int, workers: int, users: int, start_at: float, duration: float) -> dict:
+    """Submit answers for the users of one shard until the duration is over"""
+    import telegram_bot as bot
+
+    await bot.writer.start()
+    key = bot.store.get_test(LARGE_TEST)['answers']
+    shard_users = range(index or workers, users + 1, workers)
+
+    stall = 0.0
+
+    async def probe():
+        nonlocal stall
+        last = time.monotonic()
+        while True:
+            await asyncio.sleep(PROBE_INTERVAL)
+            now = time.monotonic()
+            stall = max(stall, now - last - PROBE_INTERVAL)
+            last = now
+
+    await asyncio.sleep(max(0.0, start_at - time.time()))
+    probe_task = asyncio.create_task(probe())
+    submitted = 0
+    deadline = time.monotonic() + duration
+    while time.monotonic() < deadline:
+        user_id = shard_users[submitted % len(shard_users)]
+        await bot.handle_message(make_update(user_id, key), make_context({'selected_test': LARGE_TEST}))
+        submitted += 1
+    probe_task.cancel()
+
+    await bot.writer.stop()
+    bot.store.close()
+    return {'submitted': submitted, 'stall': stall}
+
+
+def worker(index: int, workers: int, users: int, start_at: float, duration: float):
+    """One worker process (bot_data in the current directory), prints its result as JSON"""
+    logging.disable(logging.INFO)
+    sys.path.insert(0, REPO_DIR)
+    print(json.dumps(asyncio.run(submit_loop(index, workers, users, start_at, duration))))
+
+
+def run_workers(data_dir: str, workers: int, users: int, duration: float) -> dict:
+    """Run workers processes at once, return ops/s and the longest stall"""
+    start_at = time.time() + STARTUP_TIME
+    processes = []
+    for index in range(workers):
+        env = dict(os.environ, STORAGE_BACKEND='sqlite', SHARD_INDEX=str(index), SHARD_WORKERS=str(workers),
+                   BOT_TOKEN=os.getenv('BOT_TOKEN', '1:benchmark'))
+        processes.append(subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__), '--worker', str(index), '--workers', str(workers),
+             '--users', str(users), '--start-at', str(start_at), '--duration', str(duration)],
+            cwd=data_dir, env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True
+        ))
+
+    results = []
+    for process in processes:
+        stdout, stderr = process.communicate()
+        if process.returncode != 0:
+            sys.exit(f"Worker failed:\n{stderr}")
+        results.append(json.loads(stdout.strip().splitlines()[-1]))
+    return {
+        'ops_per_s': sum(result['submitted'] for result in results) / duration,
+        'stall_ms': max(result['stall'] for result in results) * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--workers', default='1,2,4', help="worker counts to compare")
+    parser.add_argument('--users', type=int, default=10_000)
+    parser.add_argument('--duration', type=float, default=5.0, help="seconds per run")
+    parser.add_argument('--worker', type=int, help=argparse.SUPPRESS)
+    parser.add_argument('--start-at', type=float, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker is not None:
+        worker(args.worker, int(args.workers), args.users, args.start_at, args.duration)
+        return
+
+    print(f"{args.users} users, {args.duration:g}s per run, {os.cpu_count()} CPU core(s)")
+    print(f"{'workers':>7} {'ops/s':>10} {'speedup':>8} {'stall ms':>9}")
+    single = None
+    for workers in (int(count) for count in args.workers.split(',')):
+        with tempfile.TemporaryDirectory() as tmp:
+            build_data(os.path.join(tmp, 'bot_data'), args.users, 'sqlite')
+            result = run_workers(tmp, workers, args.users, args.duration)
+        single = single or result['ops_per_s']
+        print(f"{workers:>7} {result['ops_per_s']:>10.1f} {result['ops_per_s'] / single:>8.2f} "
+              f"{result['stall_ms']:>9.1f}")
+
+
+if __name__ == '__main__':
+    main()
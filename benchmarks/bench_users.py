@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Memory per user: users.json as loaded dicts vs. the compact UserRegistry
+Builds synthetic users (first names and surnames repeat as in real data,
+usernames are unique), loads them the way JsonStore does and measures the
+traced memory of:
+
+  users          users.json as a dict of dicts  vs.  UserRegistry
+  registrations  one test everybody registered for, with the copied
+                 name / surname  vs.  referencing the user by id
+
+Usage: python benchmarks/bench_users.py [--users 200000]
+"""
+
+import argparse
+import gc
+import json
+import os
+import random
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from user_registry import UserRegistry  # noqa: E402
+
+FIRST_NAMES = 400
+SURNAMES = 1500
+
+
+def build_json(users: int) -> tuple:
+    """users.json text and registrations.json texts with and without the copied names"""
+    rng = random.Random(users)
+    first_names = [f"Ism{i}" for i in range(FIRST_NAMES)]
+    surnames = [f"Familiya{i}ov" for i in range(SURNAMES)]
+
+    user_records = {}
+    registrations = {}
+    for n in range(users):
+        user_id = str(5_000_000_000 + n * 7919)
+        name, surname = rng.choice(first_names), rng.choice(surnames)
+        user_records[user_id] = {
+            'name': name, 'surname': surname,
+            'username': f"user_{n}" if rng.random() < 0.7 else None,
+            'registered_at': f"2026-0{rng.randint(1, 9)}-{rng.randint(10, 28)} "
+                             f"{rng.randint(10, 23)}:{rng.randint(10, 59)}:{rng.randint(10, 59)}",
+        }
+        registrations[user_id] = {
+            'name': name, 'surname': surname,
+            'registered_at': user_records[user_id]['registered_at'],
+            'answers': None, 'score': None,
+        }
+    by_id = {
+        user_id: {key: value for key, value in registration.items() if key not in ('name', 'surname')}
+        for user_id, registration in registrations.items()
+    }
+    return (json.dumps(user_records, ensure_ascii=False),
+            json.dumps({'1': registrations}, ensure_ascii=False),
+            json.dumps({'1': by_id}, ensure_ascii=False))
+
+
+def traced(build) -> tuple:
+    """(object, bytes still allocated by build())"""
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    gc.collect()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--users', type=int, default=200_000)
+    args = parser.parse_args()
+
+    users_text, copied_text, by_id_text = build_json(args.users)
+
+    _, users_dicts = traced(lambda: json.loads(users_text))
+    _, users_registry = traced(lambda: UserRegistry(json.loads(users_text)))
+    _, registrations_copied = traced(lambda: json.loads(copied_text))
+    _, registrations_by_id = traced(lambda: json.loads(by_id_text))
+
+    per_user = lambda size: size / args.users  # noqa: E731
+    print(f"{args.users} users, bytes per user")
+    print(f"{'':<16} {'before':>8} {'after':>8} {'saved':>7}")
+    for label, before, after in (
+        ('users', users_dicts, users_registry),
+        ('registrations', registrations_copied, registrations_by_id),
+        ('total', users_dicts + registrations_copied, users_registry + registrations_by_id),
+    ):
+        print(f"{label:<16} {per_user(before):>8.0f} {per_user(after):>8.0f} {1 - after / before:>7.0%}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Startup time of the bot: `python -X importtime` report for telegram_bot
+Imports the bot in a fresh interpreter (inside a temporary directory, so
+bot_data is not touched) and prints the total import time, the slowest
+direct imports and the peak RSS. Fails if a module of the analytics stack
+is loaded at startup or if the import takes longer than --budget-ms.
+
+Usage: python benchmarks/startup_time.py [--runs 5] [--top 15] [--budget-ms N]
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+REPO_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+# Only the admin Rasch / grading paths may load these
+HEAVY_MODULES = ('numpy', 'pandas', 'matplotlib', 'seaborn')
+
+
+def run_python(code: str, *options) -> subprocess.CompletedProcess:
+    """Run code in a new interpreter that can import the bot"""
+    env = dict(os.environ, PYTHONPATH=REPO_DIR, PYTHONDONTWRITEBYTECODE='1')
+    with tempfile.TemporaryDirectory() as cwd:
+        result = subprocess.run(
+            [sys.executable, *options, '-c', code],
+            cwd=cwd, env=env, capture_output=True, text=True
+        )
+    if result.returncode != 0:
+        sys.exit(f"Importing telegram_bot failed:\n{result.stderr}")
+    return result
+
+
+def import_times() -> list:
+    """[(name, depth, self_us, cumulative_us)] from one -X importtime run"""
+    result = run_python('import telegram_bot', '-X', 'importtime')
+    entries = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip())) // 2
+        entries.append((name.strip(), depth, int(self_us), int(cumulative_us)))
+    return entries
+
+
+def bot_imports(entries: list) -> list:
+    """Direct imports of telegram_bot (importtime lists children before their parent)"""
+    end = next(i for i, entry in enumerate(entries) if entry[0] == 'telegram_bot' and entry[1] == 0)
+    start = end
+    while start > 0 and entries[start - 1][1] > 0:
+        start -= 1
+    return [entry for entry in entries[start:end] if entry[1] == 1]
+
+
+def peak_rss_mb() -> float:
+    """Peak RSS after importing the bot (without importtime overhead)"""
+    result = run_python(
+        'import resource, telegram_bot; '
+        'print(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)'
+    )
+    return int(result.stdout.strip().splitlines()[-1]) / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5, help="interpreter runs, the median is reported")
+    parser.add_argument('--top', type=int, default=15, help="slowest direct imports to show")
+    parser.add_argument('--budget-ms', type=float, help="fail if the median import time is higher")
+    args = parser.parse_args()
+
+    runs = [import_times() for _ in range(args.runs)]
+    totals = [next(cumulative for name, _, _, cumulative in run if name == 'telegram_bot') for run in runs]
+    total_ms = statistics.median(totals) / 1000
+    median_run = runs[totals.index(sorted(totals)[len(totals) // 2])]
+
+    print(f"import telegram_bot: {total_ms:.0f} ms (median of {args.runs}), "
+          f"peak RSS {peak_rss_mb():.1f} MB\n")
+    print(f"{'module':<40} {'cumulative ms':>14} {'self ms':>9}")
+    for name, _, self_us, cumulative_us in sorted(bot_imports(median_run), key=lambda e: -e[3])[:args.top]:
+        print(f"{name:<40} {cumulative_us / 1000:>14.1f} {self_us / 1000:>9.1f}")
+
+    failures = []
+    heavy = sorted({name.split('.')[0] for name, *_ in median_run} & set(HEAVY_MODULES))
+    if heavy:
+        failures.append(f"analytics stack loaded at startup: {', '.join(heavy)}")
+    if args.budget_ms is not None and total_ms > args.budget_ms:
+        failures.append(f"import time {total_ms:.0f} ms is over the {args.budget_ms:.0f} ms budget")
+
+    for failure in failures:
+        print(f"\nFAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Post Telegram update JSON to the bot's webhook server
+Drives a bot started in webhook mode (WEBHOOK_URL set) the way Telegram
+does: POST requests with the X-Telegram-Bot-Api-Secret-Token header.
+Without --file it sends a /start message and a subscription-check callback
+from --user-id. Reports HTTP status codes and request latency, and checks
+that a request with a wrong secret token is rejected. Needs a running bot;
+tests/test_webhook.py checks the webhook server without one.
+
+Usage: python benchmarks/webhook_post.py [--url URL] [--secret TOKEN]
+           [--file updates.json] [--user-id N] [--count 100] [--concurrency 10]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+from collections import Counter
+
+import httpx
+
+SECRET_HEADER = 'X-Telegram-Bot-Api-Secret-Token'
+
+
+def sample_updates(user_id: int) -> list:
+    """A /start message and a check_subscription callback from one user"""
+    user = {'id': user_id, 'is_bot': False, 'first_name': 'Test', 'language_code': 'uz'}
+    chat = {'id': user_id, 'type': 'private', 'first_name': 'Test'}
+    now = int(time.time())
+    return [
+        {
+            'update_id': 1,
+            'message': {
+                'message_id': 1, 'date': now, 'chat': chat, 'from': user, 'text': '/start',
+                'entities': [{'type': 'bot_command', 'offset': 0, 'length': 6}],
+            },
+        },
+        {
+            'update_id': 2,
+            'callback_query': {
+                'id': '1', 'from': user, 'chat_instance': '1', 'data': 'check_subscription',
+                'message': {'message_id': 2, 'date': now, 'chat': chat, 'text': 'Obuna'},
+            },
+        },
+    ]
+
+
+def load_updates(path: str) -> list:
+    """Updates from a JSON file (one update object or a list of them)"""
+    with open(path, 'r', encoding='utf-8') as f:
+        updates = json.load(f)
+    return updates if isinstance(updates, list) else [updates]
+
+
+async def post_all(url: str, secret: str, updates: list, count: int, concurrency: int):
+    """POST count updates (cycling through updates), return (statuses, latencies, rejected)"""
+    headers = {SECRET_HEADER: secret} if secret else {}
+    statuses = Counter()
+    latencies = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async with httpx.AsyncClient(timeout=30) as client:
+        async def post(i):
+            update = dict(updates[i % len(updates)], update_id=1_000_000 + i)
+            async with semaphore:
+                start = time.perf_counter()
+                try:
+                    response = await client.post(url, json=update, headers=headers)
+                    statuses[response.status_code] += 1
+                except httpx.HTTPError as e:
+                    statuses[type(e).__name__] += 1
+                    return
+                latencies.append(time.perf_counter() - start)
+
+        await asyncio.gather(*(post(i) for i in range(count)))
+
+        rejected = None
+        if secret:
+            response = await client.post(url, json=updates[0], headers={SECRET_HEADER: secret + 'x'})
+            rejected = response.status_code == 403
+
+    return statuses, latencies, rejected
+
+
+def main():
+    default_url = (f"http://127.0.0.1:{os.getenv('WEBHOOK_PORT', os.getenv('PORT', '8443'))}"
+                   f"/{os.getenv('WEBHOOK_PATH', 'telegram')}")
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--url', default=default_url, help=f"webhook URL (default {default_url})")
+    parser.add_argument('--secret', default=os.getenv('WEBHOOK_SECRET_TOKEN', ''),
+                        help="secret token (default $WEBHOOK_SECRET_TOKEN)")
+    parser.add_argument('--file', help="JSON file with an update or a list of updates")
+    parser.add_argument('--user-id', type=int, default=int(os.getenv('ADMIN_IDS', '1').split(',')[0]),
+                        help="sender of the sample updates (default: first ADMIN_IDS)")
+    parser.add_argument('--count', type=int, default=2, help="requests to send")
+    parser.add_argument('--concurrency', type=int, default=10, help="requests in flight")
+    args = parser.parse_args()
+
+    updates = load_updates(args.file) if args.file else sample_updates(args.user_id)
+    start = time.perf_counter()
+    statuses, latencies, rejected = asyncio.run(
+        post_all(args.url, args.secret, updates, args.count, args.concurrency)
+    )
+    elapsed = time.perf_counter() - start
+
+    print(f"{args.count} updates to {args.url} in {elapsed:.2f}s ({args.count / elapsed:.0f}/s)")
+    print("status codes: " + ", ".join(f"{status}: {n}" for status, n in sorted(statuses.items(), key=str)))
+    if latencies:
+        latencies.sort()
+        print(f"latency ms: p50 {statistics.median(latencies) * 1000:.1f}, "
+              f"p95 {latencies[int((len(latencies) - 1) * 0.95)] * 1000:.1f}, max {latencies[-1] * 1000:.1f}")
+    if rejected is not None:
+        print(f"wrong secret token rejected: {'yes' if rejected else 'NO'}")
+
+    ok = statuses.get(200, 0) == args.count and rejected is not False
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Rate-aware broadcast engine
+Messages are sent by a fixed number of workers under one global token
+bucket (Telegram allows about 30 messages per second). RetryAfter pauses
+the whole bucket, network errors are retried with backoff, and every
+recipient's delivery status is journaled so an interrupted broadcast can
+be resumed without sending anything twice.
+"""
+
+import asyncio
+import hashlib
+import logging
+import os
+import time
+
+from telegram.error import BadRequest, NetworkError, RetryAfter
+
+from journal import Journal
+
+logger = logging.getLogger(__name__)
+
+# Messages per second across all broadcasts
+BROADCAST_RATE = float(os.getenv('BROADCAST_RATE', '30'))
+
+# Number of recipients handled in parallel
+BROADCAST_CONCURRENCY = int(os.getenv('BROADCAST_CONCURRENCY', '10'))
+
+# Attempts for timeouts / network errors before a recipient is marked failed
+BROADCAST_MAX_RETRIES = int(os.getenv('BROADCAST_MAX_RETRIES', '3'))
+
+# Seconds between progress reports
+PROGRESS_INTERVAL = float(os.getenv('BROADCAST_PROGRESS_INTERVAL', '3'))
+
+
+class TokenBucket:
+    """Async token bucket shared by all senders"""
+
+    def __init__(self, rate: float, capacity: float = None):
+        self.rate = rate
+        self.capacity = capacity or rate
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        """Wait for one token"""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    await asyncio.sleep(self._paused_until - now)
+                    continue
+
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+    def pause(self, seconds: float):
+        """Stop handing out tokens for a while (flood control)"""
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+        self._tokens = 0
+
+
+class Broadcaster:
+    """Sends per-recipient messages with bounded concurrency and resumable status"""
+
+    def __init__(self, status_dir: str, rate: float = BROADCAST_RATE,
+                 concurrency: int = BROADCAST_CONCURRENCY, max_retries: int = BROADCAST_MAX_RETRIES):
+        os.makedirs(status_dir, exist_ok=True)
+        self.status_dir = status_dir
+        self.bucket = TokenBucket(rate)
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self._running = {}  # broadcast_id -> task of the running broadcast
+
+    def _journal_path(self, broadcast_id: str) -> str:
+        """Status journal of a broadcast (ids contain free-text test ids, so hash them)"""
+        name = hashlib.sha1(str(broadcast_id).encode('utf-8')).hexdigest()[:16]
+        return os.path.join(self.status_dir, f"{name}.journal")
+
+    async def send(self, broadcast_id: str, deliveries, progress=None,
+                   progress_interval: float = PROGRESS_INTERVAL) -> dict:
+        """
+        Deliver messages to recipients
+        deliveries: list of (chat_id, steps), each step is an async callable
+                    without arguments (e.g. functools.partial(bot.send_message, ...))
+        progress: optional async callable receiving the stats dict
+        Returns: stats dict with total, sent, failed and skipped counts
+        A send with the id of a running broadcast waits for that broadcast
+        and returns its stats instead of sending everything a second time.
+        """
+        running = self._running.get(broadcast_id)
+        if running is not None:
+            logger.info(f"Broadcast {broadcast_id} is already running, waiting for it")
+            return dict(await asyncio.shield(running))
+
+        task = asyncio.create_task(self._send(broadcast_id, deliveries, progress, progress_interval))
+        self._running[broadcast_id] = task
+        try:
+            return await task
+        finally:
+            del self._running[broadcast_id]
+
+    async def _send(self, broadcast_id: str, deliveries, progress, progress_interval: float) -> dict:
+        """Run one broadcast"""
+        log = Journal(self._journal_path(broadcast_id))
+        delivered = {event['chat'] for event in log.replay() if event['ok']}
+
+        stats = {'total': len(deliveries), 'sent': 0, 'failed': 0, 'skipped': 0}
+        queue = asyncio.Queue()
+        for chat_id, steps in deliveries:
+            if chat_id in delivered:
+                stats['skipped'] += 1
+            else:
+                queue.put_nowait((chat_id, steps))
+        if stats['skipped']:
+            logger.info(f"Broadcast {broadcast_id}: resuming, {stats['skipped']} already delivered")
+
+        async def worker():
+            while True:
+                try:
+                    chat_id, steps = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                try:
+                    await self._deliver(steps)
+                    stats['sent'] += 1
+                    log.append({'chat': chat_id, 'ok': True})
+                except Exception as e:
+                    logger.error(f"Broadcast {broadcast_id}: error sending to {chat_id}: {e}")
+                    stats['failed'] += 1
+                    log.append({'chat': chat_id, 'ok': False})
+
+        async def reporter():
+            while True:
+                await asyncio.sleep(progress_interval)
+                await progress(dict(stats))
+
+        reporter_task = asyncio.create_task(reporter()) if progress else None
+        try:
+            await asyncio.gather(*(worker() for _ in range(self.concurrency)))
+        finally:
+            if reporter_task is not None:
+                reporter_task.cancel()
+            log.close()
+
+        # Finished - a later broadcast with the same id starts from scratch
+        if os.path.exists(log.path):
+            os.remove(log.path)
+        if progress:
+            await progress(dict(stats))
+        return stats
+
+    async def _deliver(self, steps):
+        """Run each send step under the rate limit, retrying transient errors"""
+        for step in steps:
+            attempt = 0
+            while True:
+                await self.bucket.acquire()
+                try:
+                    await step()
+                    break
+                except RetryAfter as e:
+                    logger.warning(f"Flood control, pausing broadcast for {e.retry_after}s")
+                    self.bucket.pause(e.retry_after)
+                except BadRequest:
+                    # Permanent (BadRequest is a NetworkError subclass, so catch it first)
+                    raise
+                except NetworkError:
+                    attempt += 1
+                    if attempt > self.max_retries:
+                        raise
+                    await asyncio.sleep(min(2 ** attempt, 30))
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Bulk test import from an uploaded CSV / JSON file
+CSV: header row with test_id, answers, deadline, check_time.
+JSON: a list of objects with the same keys, or {test_id: {...}} as in tests.json.
+Every row is validated first; the tests are only saved if no row has an error.
+"""
+
+import csv
+import io
+import json
+from datetime import datetime
+
+from answers import count_questions
+
+FIELDS = ('test_id', 'answers', 'deadline', 'check_time')
+
+TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+# Longest test id that still fits into button callback data (64 bytes)
+MAX_TEST_ID_LENGTH = 32
+
+# Largest accepted upload
+MAX_FILE_SIZE = 1024 * 1024
+
+
+class BulkImportError(ValueError):
+    """The file cannot be read at all"""
+
+
+def read_rows(filename: str, data: bytes) -> list:
+    """[(row_number, {field: value})] from CSV or JSON file contents"""
+    try:
+        text = data.decode('utf-8-sig')
+    except UnicodeDecodeError:
+        raise BulkImportError("Fayl UTF-8 kodlashda emas")
+
+    if filename.lower().endswith('.json'):
+        try:
+            content = json.loads(text)
+        except ValueError as e:
+            raise BulkImportError(f"JSON xato: {e}")
+        if isinstance(content, dict):
+            content = [
+                {'test_id': test_id, **test_data} if isinstance(test_data, dict) else test_data
+                for test_id, test_data in content.items()
+            ]
+        if not isinstance(content, list):
+            raise BulkImportError("JSON ro'yxat yoki obyekt bo'lishi kerak")
+        return list(enumerate(content, 1))
+
+    reader = csv.DictReader(io.StringIO(text))
+    missing = [field for field in FIELDS if field not in (reader.fieldnames or ())]
+    if missing:
+        raise BulkImportError(f"CSV sarlavhasida ustunlar yo'q: {', '.join(missing)}")
+    # Line 1 is the header
+    return [(reader.line_num, row) for row in reader]
+
+
+def validate_row(row, seen: set) -> tuple:
+    """Return (test_id, test_data, None) or (test_id, None, error message)"""
+    if not isinstance(row, dict):
+        return None, None, "obyekt emas"
+
+    values = {field: str(row.get(field) or '').strip() for field in FIELDS}
+    test_id = values['test_id']
+    errors = []
+
+    if not test_id:
+        errors.append("test_id bo'sh")
+    elif len(test_id) > MAX_TEST_ID_LENGTH:
+        errors.append(f"test_id {MAX_TEST_ID_LENGTH} belgidan uzun")
+    elif test_id in seen:
+        errors.append("test_id faylda takrorlangan")
+
+    if count_questions(values['answers']) == 0:
+        errors.append("javoblar yo'q")
+
+    times = {}
+    for field in ('deadline', 'check_time'):
+        try:
+            times[field] = datetime.strptime(values[field], TIME_FORMAT)
+        except ValueError:
+            errors.append(f"{field} formati noto'g'ri (YYYY-MM-DD HH:MM:SS)")
+    if len(times) == 2 and times['check_time'] < times['deadline']:
+        errors.append("check_time deadline'dan oldin")
+
+    if errors:
+        return test_id, None, "; ".join(errors)
+
+    seen.add(test_id)
+    return test_id, {
+        'answers': values['answers'],
+        'deadline': values['deadline'],
+        'check_time': values['check_time'],
+    }, None
+
+
+def parse_tests(filename: str, data: bytes) -> tuple:
+    """
+    Validate an uploaded file
+    Returns (tests, errors): tests is {test_id: test_data} in file order,
+    errors is [(row_number, test_id, message)]. Raises BulkImportError if the
+    file cannot be read.
+    """
+    tests = {}
+    errors = []
+    seen = set()
+    for row_number, row in read_rows(filename, data):
+        test_id, test_data, error = validate_row(row, seen)
+        if error is not None:
+            errors.append((row_number, test_id, error))
+        else:
+            tests[test_id] = test_data
+    return tests, errors
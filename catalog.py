@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Precompiled test catalog
+Deadlines and question counts are parsed once when a test is added.
+The main menu keyboard is rendered once and reused until a test is added
+or the next deadline (kept in a min-heap) passes.
+"""
+
+import heapq
+import logging
+from datetime import datetime
+
+from telegram import KeyboardButton, ReplyKeyboardMarkup
+
+from answers import count_questions
+
+logger = logging.getLogger(__name__)
+
+REFRESH_BUTTON = "🔄 Yangilash"
+
+
+class TestCatalog:
+    """Parsed tests and the cached main menu"""
+
+    def __init__(self, tests: dict = None):
+        self._entries = {}    # test_id -> (deadline datetime, question count)
+        self._question_counts = {}
+        self._deadlines = []  # min-heap of (deadline, test_id) for open tests
+        self._menu = None     # cached (text, reply_markup)
+        for test_id, test_data in (tests or {}).items():
+            self.add(test_id, test_data)
+
+    def add(self, test_id, test_data: dict):
+        """Add or replace a test"""
+        self._question_counts[test_id] = count_questions(test_data['answers'])
+        try:
+            deadline = datetime.strptime(test_data['deadline'], '%Y-%m-%d %H:%M:%S')
+        except (KeyError, ValueError) as e:
+            logger.error(f"Test #{test_id} has an invalid deadline: {e}")
+            return
+        self._entries[test_id] = (deadline, self._question_counts[test_id])
+        heapq.heappush(self._deadlines, (deadline, test_id))
+        self._menu = None
+
+    def question_count(self, test_id) -> int:
+        """Number of questions of a test"""
+        return self._question_counts[test_id]
+
+    def menu(self, now: datetime = None) -> tuple:
+        """Return (text, reply_markup) of the main menu"""
+        now = now or datetime.now()
+        self._expire(now)
+        if self._menu is None:
+            self._menu = self._render(now)
+        return self._menu
+
+    def _expire(self, now: datetime):
+        """Drop tests whose deadline has passed from the heap"""
+        while self._deadlines and self._deadlines[0][0] <= now:
+            deadline, test_id = heapq.heappop(self._deadlines)
+            entry = self._entries.get(test_id)
+            if entry is not None and entry[0] == deadline:
+                # Only a current deadline changes the menu, not a replaced one
+                self._menu = None
+
+    def _render(self, now: datetime) -> tuple:
+        """Build the main menu keyboard"""
+        if not self._entries:
+            return (
+                "📋 Hozirda mavjud testlar yo'q.",
+                ReplyKeyboardMarkup([[KeyboardButton(REFRESH_BUTTON)]], resize_keyboard=True)
+            )
+
+        keyboard = [
+            [KeyboardButton(f"📝 Test #{test_id} ({question_count} ta savol)")]
+            for test_id, (deadline, question_count) in self._entries.items()
+            if now < deadline
+        ]
+
+        if not keyboard:
+            return (
+                "📋 Hozirda mavjud testlar yo'q (barcha testlar deadline o'tgan).",
+                ReplyKeyboardMarkup([[KeyboardButton(REFRESH_BUTTON)]], resize_keyboard=True)
+            )
+
+        available_count = len(keyboard)
+        keyboard.append([KeyboardButton(REFRESH_BUTTON)])
+        return (
+            f"📋 Mavjud testlar: {available_count} ta\n\n"
+            "Test tanlash uchun tugmani bosing:",
+            ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
+        )
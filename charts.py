@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Chart rendering with the object-oriented Matplotlib API
+No pyplot global state and no seaborn: every thread renders on its own
+reusable Figure with an Agg canvas, so charts can be drawn concurrently.
+"""
+
+import io
+import threading
+
+import numpy as np
+from matplotlib import colormaps
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.colors import LinearSegmentedColormap
+from matplotlib.figure import Figure
+
+DPI = 150
+
+# Same colors as seaborn's "Blues_d" palette: Blues at 1/3 and 2/3 blended into dark grey
+_BLUES_D = LinearSegmentedColormap.from_list(
+    'blues_d', [colormaps['Blues'](1 / 3), colormaps['Blues'](2 / 3), '#333333']
+)
+
+# Styled figure templates (size and margins of each chart type)
+TEMPLATES = {
+    'difficulty': {
+        'figsize': (12, 6),
+        'margins': {'left': 0.06, 'right': 0.99, 'bottom': 0.12, 'top': 0.9},
+    },
+}
+
+_local = threading.local()
+
+
+def _figure(template: str) -> Figure:
+    """Return this thread's figure for a template, cleared and ready to draw on"""
+    figures = getattr(_local, 'figures', None)
+    if figures is None:
+        figures = _local.figures = {}
+
+    figure = figures.get(template)
+    if figure is None:
+        style = TEMPLATES[template]
+        figure = Figure(figsize=style['figsize'], dpi=DPI, facecolor='white')
+        FigureCanvasAgg(figure)
+        figures[template] = figure
+    else:
+        figure.clear()
+    figure.subplots_adjust(**TEMPLATES[template]['margins'])
+    return figure
+
+
+def _style_axes(ax):
+    """White background, no top/right spines (seaborn "white" + despine look)"""
+    ax.set_facecolor('white')
+    for side in ('top', 'right'):
+        ax.spines[side].set_visible(False)
+    for side in ('left', 'bottom'):
+        ax.spines[side].set_color('0.15')
+    ax.tick_params(colors='0.15', length=0)
+
+
+def _png(figure: Figure) -> bytes:
+    """Render figure to PNG bytes"""
+    buf = io.BytesIO()
+    figure.savefig(buf, format='png', dpi=DPI, facecolor='white')
+    return buf.getvalue()
+
+
+def render_difficulty_chart(test_id, labels, values) -> bytes:
+    """Bar chart of item weights (1.0 - 4.0), sorted as given"""
+    labels = list(labels)
+    values = np.asarray(values, dtype=float)
+
+    figure = _figure('difficulty')
+    ax = figure.add_subplot()
+    _style_axes(ax)
+
+    positions = np.arange(len(labels))
+    bars = ax.bar(positions, values, width=0.8, color=_BLUES_D(np.linspace(0, 1, len(labels))))
+    ax.bar_label(bars, fmt='%.2f', padding=3, fontsize=9, fontweight='bold', color='black')
+
+    ax.set_title(f'Test #{test_id} - Savollar Qiyinlik Darajasi (Rasch Analysis)',
+                 fontsize=14, fontweight='bold', pad=15)
+    ax.set_xlabel('Savollar', fontsize=11, fontweight='bold')
+    ax.set_ylabel('Ball (1.0 - 4.0)', fontsize=11, fontweight='bold')
+    ax.set_xticks(positions, labels, rotation=45, ha='right')
+    ax.set_xlim(-0.5, len(labels) - 0.5)
+    ax.set_ylim(0, 4.5)
+
+    return _png(figure)
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Automatic grading at each test's check_time
+One JobQueue job per test is registered at startup (rebuilt from the
+stored tests) and whenever a test is added. Finished checks are recorded
+in a JSON file, so a restart neither repeats a check nor misses one whose
+check_time passed while the bot was down (those run shortly after start,
+if they are at most CHECK_CATCH_UP_WINDOW old). When the record does not
+exist yet (first start with automatic checks), tests whose check_time has
+already passed are recorded as handled instead of being graded late.
+"""
+
+import logging
+import os
+from datetime import datetime, timedelta
+
+from storage import load_data, save_data
+
+logger = logging.getLogger(__name__)
+
+# Seconds after startup to run checks whose check_time passed while the bot was down
+CHECK_CATCH_UP_DELAY = float(os.getenv('CHECK_CATCH_UP_DELAY', '30'))
+
+# Hours a missed check_time is still caught up after startup (older ones are left to admins)
+CHECK_CATCH_UP_WINDOW = float(os.getenv('CHECK_CATCH_UP_WINDOW', '24'))
+
+TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+class CheckSchedule:
+    """check_time jobs of all tests and the record of finished checks"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._first_run = not os.path.exists(path)
+        self._done = load_data(path)  # test_id -> time the test was checked
+
+    @staticmethod
+    def job_name(test_id) -> str:
+        """JobQueue name of a test's check job"""
+        return f"check_{test_id}"
+
+    def is_done(self, test_id) -> bool:
+        """Whether a test has already been checked"""
+        return test_id in self._done
+
+    def restore(self, job_queue, tests: dict, callback, checked=None) -> int:
+        """
+        Schedule every test that has not been checked yet, return the number of jobs
+        checked(test_id) tells whether a test not in the record was already
+        graded (e.g. by an admin before this record existed).
+        """
+        now = datetime.now().astimezone()
+        scheduled = 0
+        for test_id, test_data in tests.items():
+            if self.is_done(test_id):
+                continue
+            if checked is not None and checked(test_id):
+                self._done[test_id] = datetime.now().strftime(TIME_FORMAT)
+                continue
+            if self._first_run:
+                # Tests that were due before automatic checks existed are left to admins
+                check_time = self._check_time(test_id, test_data)
+                if check_time is not None and check_time <= now:
+                    self._done[test_id] = datetime.now().strftime(TIME_FORMAT)
+                    continue
+            scheduled += self._schedule(job_queue, test_id, test_data, callback)
+        save_data(self.path, self._done)
+        self._first_run = False
+        return scheduled
+
+    def add(self, job_queue, test_id, test_data: dict, callback) -> bool:
+        """Schedule a new or replaced test (its earlier check no longer counts)"""
+        if self._done.pop(test_id, None) is not None:
+            save_data(self.path, self._done)
+        return self._schedule(job_queue, test_id, test_data, callback)
+
+    def finish(self, job_queue, test_id):
+        """Record a finished check and drop the test's pending job"""
+        self._done[test_id] = datetime.now().strftime(TIME_FORMAT)
+        save_data(self.path, self._done)
+        if job_queue is not None:
+            for job in job_queue.get_jobs_by_name(self.job_name(test_id)):
+                job.schedule_removal()
+
+    @staticmethod
+    def _check_time(test_id, test_data: dict):
+        """check_time of a test as an aware datetime, None if it is invalid"""
+        try:
+            # check_time is entered in the server's local time
+            return datetime.strptime(test_data['check_time'], TIME_FORMAT).astimezone()
+        except (KeyError, TypeError, ValueError) as e:
+            logger.error(f"Test #{test_id} has an invalid check_time: {e}")
+            return None
+
+    def _schedule(self, job_queue, test_id, test_data: dict, callback) -> bool:
+        """Register (or replace) the check job of a test"""
+        check_time = self._check_time(test_id, test_data)
+        if check_time is None:
+            return False
+
+        for job in job_queue.get_jobs_by_name(self.job_name(test_id)):
+            job.schedule_removal()
+
+        now = datetime.now().astimezone()
+        if check_time < now - timedelta(hours=CHECK_CATCH_UP_WINDOW):
+            logger.warning(f"Test #{test_id} missed its check_time {check_time:%Y-%m-%d %H:%M:%S} "
+                           f"by more than {CHECK_CATCH_UP_WINDOW:g}h, not checking it automatically")
+            return False
+        run_at = check_time if check_time > now else now + timedelta(seconds=CHECK_CATCH_UP_DELAY)
+        job_queue.run_once(callback, when=run_at, data=test_id, name=self.job_name(test_id))
+        logger.info(f"Test #{test_id} will be checked at {run_at:%Y-%m-%d %H:%M:%S}")
+        return True
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+CSV export of a test's registrations, answers, scores and Rasch results
+Rows are read from the store batch by batch and written straight to a
+file, so memory use does not grow with the number of participants.
+"""
+
+import asyncio
+import csv
+import os
+import tempfile
+
+# Registrations read from the store between two event loop yields
+EXPORT_BATCH_SIZE = int(os.getenv('EXPORT_BATCH_SIZE', '1000'))
+
+USER_COLUMNS = ('name', 'surname')
+REGISTRATION_COLUMNS = ('registered_at', 'submitted_at', 'answers', 'score')
+RASCH_COLUMNS = ('Togri_Javoblar', 'Rasch_Ball_90.5', 'Sertifikat',
+                 'Qobiliyat_logit', 'Qobiliyat_SE', 'Infit', 'Outfit')
+
+
+class RaschColumns:
+    """Per-user lookup of the Rasch result_df columns (indexed by user_id)"""
+
+    def __init__(self, result_df=None):
+        if result_df is None:
+            # No analysis of the current submissions, every Rasch cell stays empty
+            self._positions, self._columns = {}, []
+            return
+        self._positions = {user_id: i for i, user_id in enumerate(result_df.index)}
+        self._columns = [result_df[column].to_numpy() for column in RASCH_COLUMNS]
+
+    def row(self, user_id) -> list:
+        """Rasch values of a user, empty if the user was not analysed"""
+        position = self._positions.get(user_id)
+        if position is None:
+            return [''] * len(RASCH_COLUMNS)
+        return [column[position] for column in self._columns]
+
+
+def export_rows(store, batch: list, rasch: RaschColumns = None):
+    """CSV rows of a batch of (user_id, registration), names are read from the user records"""
+    for user_id, registration in batch:
+        user = store.get_user(user_id) or {}
+        row = [user_id, *(user.get(column) or '' for column in USER_COLUMNS),
+               *(registration.get(column) or '' for column in REGISTRATION_COLUMNS)]
+        if rasch is not None:
+            row.extend(rasch.row(user_id))
+        yield row
+
+
+async def write_test_csv(store, test_id, path: str, result_df=None,
+                         batch_size: int = EXPORT_BATCH_SIZE) -> int:
+    """Write all registrations of a test to path, return the number of rows"""
+    rasch = RaschColumns(result_df)
+    header = ['user_id', *USER_COLUMNS, *REGISTRATION_COLUMNS, *RASCH_COLUMNS]
+
+    count = 0
+    # utf-8-sig so spreadsheet programs detect the encoding of names
+    with open(path, 'w', newline='', encoding='utf-8-sig') as f:
+        out = csv.writer(f)
+        out.writerow(header)
+        for batch in store.registration_batches(test_id, batch_size):
+            out.writerows(export_rows(store, batch, rasch))
+            count += len(batch)
+            await asyncio.sleep(0)  # let other updates run between batches
+    return count
+
+
+async def export_test(store, test_id, result_df=None) -> tuple:
+    """Export a test to a temporary CSV file, return (path, rows); the caller removes it"""
+    fd, path = tempfile.mkstemp(prefix="export_", suffix='.csv')
+    os.close(fd)
+    try:
+        rows = await write_test_csv(store, test_id, path, result_df)
+    except BaseException:
+        os.remove(path)
+        raise
+    return path, rows
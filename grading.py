@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Vectorized grading engine
+Answer keys and submissions are encoded as uint32 arrays of letter code
+points (one letter per question, 0 = no answer) and a whole test is graded in one NumPy pass.
+Used by both the simple grading and the Rasch analysis.
+"""
+
+from typing import NamedTuple
+
+import numpy as np
+
+from answers import answer_letters
+
+
+def encode_key(answers: str) -> np.ndarray:
+    """Encode an answer key as a uint32 vector of code points"""
+    return np.frombuffer(answer_letters(answers).encode('utf-32-le'), dtype='<u4')
+
+
+def encode_submissions(submissions, num_questions: int) -> np.ndarray:
+    """Encode answer strings as an (n, num_questions) uint32 matrix, padded with 0"""
+    if num_questions == 0:
+        return np.zeros((len(submissions), 0), dtype=np.uint32)
+    text = ''.join(
+        answer_letters(answers)[:num_questions].ljust(num_questions, '\0')
+        for answers in submissions
+    )
+    return np.frombuffer(text.encode('utf-32-le'), dtype='<u4').reshape(-1, num_questions)
+
+
+class GradedTest(NamedTuple):
+    """Grading result of one test"""
+    user_ids: list            # submitting users, row order of the arrays below
+    responses: np.ndarray     # (users, questions) uint8, 1 = correct
+    scores: np.ndarray        # (users,) raw scores
+    item_rates: np.ndarray    # (questions,) share of correct answers per question
+    num_questions: int
+
+
+def grade_test(answer_key: str, submissions: dict) -> GradedTest:
+    """
+    Grade all submissions of a test at once
+    submissions: {user_id: answers}, users without answers are skipped
+    """
+    key = encode_key(answer_key)
+    user_ids = [user_id for user_id, answers in submissions.items() if answers]
+    matrix = encode_submissions([submissions[user_id] for user_id in user_ids], len(key))
+
+    responses = (matrix == key).view(np.uint8)
+    scores = responses.sum(axis=1, dtype=np.int32)
+    if len(user_ids):
+        item_rates = responses.mean(axis=0)
+    else:
+        item_rates = np.zeros(len(key))
+
+    return GradedTest(user_ids, responses, scores, item_rates, len(key))
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Append-only event journal
+Events are buffered and written as JSON lines with one fsync per batch
+(group commit). On startup the journal is replayed on top of the last
+snapshot; compaction writes a new snapshot and starts an empty journal.
+A compaction that writes its snapshot in the background first rotates the
+journal: the events the snapshot covers move to <path>.old (replayed
+before the journal) and are dropped once the snapshot is on disk.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import shutil
+
+logger = logging.getLogger(__name__)
+
+# Seconds to collect events before one write + fsync
+COMMIT_INTERVAL = float(os.getenv('JOURNAL_COMMIT_INTERVAL', '0.05'))
+
+
+class Journal:
+    """Append-only, fsync-batched journal of JSON events"""
+
+    def __init__(self, path: str, commit_interval: float = COMMIT_INTERVAL):
+        self.path = path
+        self.rotated_path = f"{path}.old"
+        self.commit_interval = commit_interval
+        self.event_count = 0
+        self._pending = []
+        self._commit_handle = None
+        self._file = None
+
+    def replay(self):
+        """Yield all committed events in order (a rotated journal first)"""
+        for path in (self.rotated_path, self.path):
+            if not os.path.exists(path):
+                continue
+            with open(path, 'r', encoding='utf-8') as f:
+                for line_number, line in enumerate(f, 1):
+                    if not line.strip():
+                        continue
+                    try:
+                        event = json.loads(line)
+                    except ValueError:
+                        # A crash during append leaves at most one torn line at the end
+                        logger.warning(f"Skipping damaged journal line {line_number} in {path}")
+                        continue
+                    self.event_count += 1
+                    yield event
+
+    def append(self, event: dict):
+        """Add event to the journal, it is written with the next group commit"""
+        self._pending.append(json.dumps(event, ensure_ascii=False, separators=(',', ':')) + "\n")
+        self.event_count += 1
+        if self._commit_handle is not None:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.commit()
+            return
+        self._commit_handle = loop.call_later(self.commit_interval, self.commit)
+
+    def commit(self):
+        """Write pending events with a single fsync"""
+        if self._commit_handle is not None:
+            self._commit_handle.cancel()
+            self._commit_handle = None
+        if not self._pending:
+            return
+
+        if self._file is None:
+            self._file = open(self.path, 'a', encoding='utf-8')
+        self._file.write(''.join(self._pending))
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._pending.clear()
+
+    def reset(self):
+        """Start an empty journal (after its events were saved in a snapshot)"""
+        self.commit()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        with open(self.path, 'w', encoding='utf-8') as f:
+            f.flush()
+            os.fsync(f.fileno())
+        self.drop_rotated()
+        self.event_count = 0
+
+    def rotate(self):
+        """Move the committed events to the rotated journal, new events start an empty one"""
+        self.commit()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if os.path.exists(self.path):
+            if os.path.exists(self.rotated_path):
+                # The snapshot of an earlier rotation failed, its events are still needed
+                with open(self.path, 'rb') as src, open(self.rotated_path, 'ab') as dst:
+                    shutil.copyfileobj(src, dst)
+                    dst.flush()
+                    os.fsync(dst.fileno())
+                os.remove(self.path)
+            else:
+                os.replace(self.path, self.rotated_path)
+        self.event_count = 0
+
+    def drop_rotated(self):
+        """Delete the rotated journal (after its events were saved in a snapshot)"""
+        if os.path.exists(self.rotated_path):
+            os.remove(self.rotated_path)
+
+    def close(self):
+        """Commit pending events and close the file"""
+        self.commit()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
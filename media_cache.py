@@ -0,0 +1,37 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Cache of Telegram file_ids for uploaded charts
+A chart is uploaded once; every later send references its file_id.
+Entries are keyed by test_id and the chart version (hash of the image),
+so a re-run with the same chart never uploads again.
+"""
+
+import hashlib
+
+from storage import load_data, save_data
+
+
+def chart_version(image_bytes: bytes) -> str:
+    """Version of a chart image"""
+    return hashlib.sha256(image_bytes).hexdigest()[:16]
+
+
+class FileIdCache:
+    """Persistent (test_id, version) -> file_id map"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.entries = load_data(path)  # test_id -> {'version': ..., 'file_id': ...}
+
+    def get(self, test_id, version: str):
+        """Return cached file_id or None"""
+        entry = self.entries.get(test_id)
+        if entry and entry['version'] == version:
+            return entry['file_id']
+        return None
+
+    def set(self, test_id, version: str, file_id: str):
+        """Remember file_id of an uploaded chart (replaces older versions of the test)"""
+        self.entries[test_id] = {'version': version, 'file_id': file_id}
+        save_data(self.path, self.entries)
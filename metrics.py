@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Prometheus metrics for handlers, Telegram API calls and storage
+Enabled by setting METRICS_PORT. Instrumentation is only installed when
+enabled (handlers and functions are wrapped at startup), so a disabled
+bot runs the original code without any extra calls. Metrics are served
+in the Prometheus text format on http://METRICS_HOST:METRICS_PORT/metrics.
+"""
+
+import asyncio
+import functools
+import inspect
+import logging
+import os
+import time
+from bisect import bisect_left
+from collections import defaultdict
+
+from telegram.ext import ConversationHandler
+from telegram.request import HTTPXRequest
+
+logger = logging.getLogger(__name__)
+
+# Port of the metrics endpoint (metrics are disabled when empty)
+METRICS_PORT = os.getenv('METRICS_PORT', '')
+METRICS_HOST = os.getenv('METRICS_HOST', '127.0.0.1')
+ENABLED = bool(METRICS_PORT)
+
+# Histogram buckets in seconds
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class Histogram:
+    """Latency histogram per label value"""
+
+    def __init__(self, name: str, help_text: str, label: str, buckets: tuple = LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label = label
+        self.buckets = buckets
+        self._series = {}  # label value -> [bucket counts..., +Inf count, sum]
+
+    def observe(self, value_label: str, seconds: float):
+        """Record one observation"""
+        series = self._series.get(value_label)
+        if series is None:
+            series = self._series[value_label] = [0] * (len(self.buckets) + 1) + [0.0]
+        series[bisect_left(self.buckets, seconds)] += 1
+        series[-1] += seconds
+
+    def render(self) -> list:
+        """Exposition lines"""
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for value_label, series in sorted(self._series.items()):
+            labels = f'{self.label}="{value_label}"'
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+            cumulative += series[len(self.buckets)]
+            lines.append(f'{self.name}_bucket{{{labels},le="+Inf"}} {cumulative}')
+            lines.append(f'{self.name}_sum{{{labels}}} {series[-1]:.6f}')
+            lines.append(f'{self.name}_count{{{labels}}} {cumulative}')
+        return lines
+
+
+class Counter:
+    """Monotonic counter per label value"""
+
+    def __init__(self, name: str, help_text: str, label: str):
+        self.name = name
+        self.help_text = help_text
+        self.label = label
+        self._values = defaultdict(int)
+
+    def inc(self, value_label: str):
+        """Add one"""
+        self._values[value_label] += 1
+
+    def render(self) -> list:
+        """Exposition lines"""
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        lines += [f'{self.name}{{{self.label}="{value_label}"}} {value}'
+                  for value_label, value in sorted(self._values.items())]
+        return lines
+
+
+class Gauge:
+    """Current value, either set directly or read from a callback when scraped"""
+
+    def __init__(self, name: str, help_text: str, callback=None):
+        self.name = name
+        self.help_text = help_text
+        self.callback = callback
+        self.value = 0
+
+    def render(self) -> list:
+        """Exposition lines"""
+        value = self.callback() if self.callback is not None else self.value
+        return [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} gauge", f"{self.name} {value}"]
+
+
+handler_latency = Histogram('bot_handler_duration_seconds', "Update handler latency", 'handler')
+handler_errors = Counter('bot_handler_errors_total', "Update handlers that raised", 'handler')
+handlers_in_flight = Gauge('bot_handlers_in_flight', "Update handlers running now")
+api_latency = Histogram('bot_api_duration_seconds', "Telegram Bot API request latency", 'method')
+api_errors = Counter('bot_api_errors_total', "Bot API requests that failed or returned an error status", 'method')
+api_in_flight = Gauge('bot_api_requests_in_flight', "Bot API requests running now")
+storage_latency = Histogram('bot_storage_duration_seconds', "Storage write / commit latency", 'operation')
+
+METRICS = [handler_latency, handler_errors, handlers_in_flight,
+           api_latency, api_errors, api_in_flight, storage_latency]
+
+
+def add_gauge(name: str, help_text: str, callback):
+    """Register a gauge read from callback() at scrape time (e.g. a queue depth)"""
+    METRICS.append(Gauge(name, help_text, callback))
+
+
+def render() -> str:
+    """All metrics in the Prometheus text format"""
+    lines = []
+    for metric in METRICS:
+        lines += metric.render()
+    return "\n".join(lines) + "\n"
+
+
+# Instrumentation
+def instrument_callback(callback):
+    """Wrap a handler callback with latency, error and in-flight metrics"""
+    name = getattr(callback, '__name__', repr(callback))
+
+    @functools.wraps(callback)
+    async def instrumented(update, context):
+        handlers_in_flight.value += 1
+        start = time.perf_counter()
+        try:
+            return await callback(update, context)
+        except Exception:
+            handler_errors.inc(name)
+            raise
+        finally:
+            handler_latency.observe(name, time.perf_counter() - start)
+            handlers_in_flight.value -= 1
+
+    return instrumented
+
+
+def _instrument_handler(handler):
+    """Instrument a handler, including the handlers inside a conversation"""
+    if isinstance(handler, ConversationHandler):
+        children = list(handler.entry_points) + list(handler.fallbacks)
+        for state_handlers in handler.states.values():
+            children += state_handlers
+        for child in children:
+            _instrument_handler(child)
+    elif getattr(handler, 'callback', None) is not None:
+        handler.callback = instrument_callback(handler.callback)
+
+
+def instrument_application(application):
+    """Wrap every registered handler callback"""
+    for handlers in application.handlers.values():
+        for handler in handlers:
+            _instrument_handler(handler)
+
+
+def instrument_method(obj, name: str, operation: str):
+    """Time one object's method (sync or async) as a storage operation"""
+    original = getattr(obj, name)
+
+    if inspect.iscoroutinefunction(original):
+        @functools.wraps(original)
+        async def instrumented(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return await original(*args, **kwargs)
+            finally:
+                storage_latency.observe(operation, time.perf_counter() - start)
+    else:
+        @functools.wraps(original)
+        def instrumented(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return original(*args, **kwargs)
+            finally:
+                storage_latency.observe(operation, time.perf_counter() - start)
+
+    # An instance attribute, so the object's own calls (timers, flush -> compact) use it too
+    setattr(obj, name, instrumented)
+
+
+def instrument_storage(store, writer):
+    """Time the writer's batch commits and the store's disk writes"""
+    instrument_method(writer, '_write_batch', 'write_batch')
+    instrument_method(store, 'flush', 'flush')
+    journal = getattr(store, 'journal', None)
+    if journal is not None:
+        # JSON store: journal group commits, snapshots and users.json
+        instrument_method(journal, 'commit', 'journal_commit')
+        instrument_method(store, 'compact', 'compact')
+        instrument_method(store, 'compact_in_background', 'compact')
+        instrument_method(store, 'save_users_in_background', 'users_save')
+
+
+class InstrumentedHTTPXRequest(HTTPXRequest):
+    """HTTPXRequest that records latency and errors per Bot API method"""
+
+    async def do_request(self, url: str, method: str, *args, **kwargs):
+        api_method = url.rsplit('/', 1)[-1]
+        api_in_flight.value += 1
+        start = time.perf_counter()
+        try:
+            status, payload = await super().do_request(url, method, *args, **kwargs)
+        except Exception:
+            api_errors.inc(api_method)
+            raise
+        finally:
+            api_latency.observe(api_method, time.perf_counter() - start)
+            api_in_flight.value -= 1
+        if status >= 400:
+            api_errors.inc(api_method)
+        return status, payload
+
+
+# HTTP endpoint
+class MetricsServer:
+    """Minimal HTTP server answering GET /metrics"""
+
+    def __init__(self, host: str = METRICS_HOST, port: int = int(METRICS_PORT or 0)):
+        self.host = host
+        self.port = port
+        self._server = None
+
+    async def start(self):
+        """Start listening"""
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        logger.info(f"Metrics on http://{self.host}:{self.port}/metrics")
+
+    async def stop(self):
+        """Stop listening"""
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def _handle(self, reader, writer):
+        """Answer one request and close the connection"""
+        try:
+            request_line = await asyncio.wait_for(reader.readline(), timeout=5)
+            while (await asyncio.wait_for(reader.readline(), timeout=5)) not in (b'\r\n', b'\n', b''):
+                pass
+            parts = request_line.decode('latin-1').split()
+            if len(parts) >= 2 and parts[0] == 'GET' and parts[1].split('?')[0] in ('/metrics', '/'):
+                status, body = "200 OK", render().encode('utf-8')
+            else:
+                status, body = "404 Not Found", b"Not found\n"
+            writer.write(
+                f"HTTP/1.1 {status}\r\n"
+                f"Content-Type: text/plain; version=0.0.4; charset=utf-8\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                f"Connection: close\r\n\r\n".encode('latin-1') + body
+            )
+            await writer.drain()
+        except (asyncio.TimeoutError, ConnectionError):
+            pass
+        finally:
+            writer.close()
@@ -0,0 +1,35 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+One-shot migration of bot_data/*.json into the SQLite store
+Usage: python migrate_to_sqlite.py [data_dir]
+After migrating, start the bot with STORAGE_BACKEND=sqlite
+"""
+
+import os
+import sys
+
+from storage import SQLITE_FILENAME, JsonStore, SQLiteStore
+
+
+def migrate(data_dir: str) -> dict:
+    """Copy users, tests and registrations (snapshot + journal) into SQLite"""
+    source = JsonStore(data_dir)
+
+    store = SQLiteStore(os.path.join(data_dir, SQLITE_FILENAME))
+    store.import_data(source.users, source.tests, source.registrations)
+    store.close()
+
+    return {
+        'users': len(source.users),
+        'tests': len(source.tests),
+        'registrations': sum(len(users) for users in source.registrations.values()),
+    }
+
+
+if __name__ == '__main__':
+    data_dir = sys.argv[1] if len(sys.argv) > 1 else "bot_data"
+    counts = migrate(data_dir)
+    print(f"✅ {os.path.join(data_dir, SQLITE_FILENAME)}: "
+          f"{counts['users']} users, {counts['tests']} tests, "
+          f"{counts['registrations']} registrations")
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Coalesced new-user notifications for the admin channel
+Each user is announced at most once: queued users and announced user_ids
+are kept in an append-only journal that survives restarts. A user counts
+as announced only once a digest with them was sent; users still waiting
+when the process stops are queued again on the next start. New users are
+collected and posted as one digest message every NOTIFY_DIGEST_INTERVAL
+seconds, or as soon as NOTIFY_DIGEST_MAX_BATCH users are waiting.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime
+
+from telegram.error import RetryAfter, TelegramError
+
+from journal import Journal
+from reports import MESSAGE_LIMIT
+
+logger = logging.getLogger(__name__)
+
+# Seconds between two digests
+NOTIFY_DIGEST_INTERVAL = float(os.getenv('NOTIFY_DIGEST_INTERVAL', '300'))
+
+# Users per digest; a full batch is sent without waiting for the interval
+NOTIFY_DIGEST_MAX_BATCH = int(os.getenv('NOTIFY_DIGEST_MAX_BATCH', '50'))
+
+# Telegram allows about 20 messages per minute in a group or channel
+MIN_DIGEST_GAP = 3.0
+
+TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+# Characters reserved for the digest header
+DIGEST_HEADER_SIZE = 100
+
+
+def digest_line(number: int, event: dict) -> str:
+    """One user of a digest"""
+    username = f"@{event['username']}" if event['username'] else "username yo'q"
+    line = f"{number}. {event['full_name']} ({username}) — {event['user_id']}"
+    if event['source_channel']:
+        line += f" — 📢 {event['source_channel']}"
+    return line
+
+
+def format_digest(events: list) -> tuple:
+    """Digest text of as many events as fit into one message, return (text, count)"""
+    lines = []
+    length = DIGEST_HEADER_SIZE
+    for number, event in enumerate(events, 1):
+        line = digest_line(number, event)
+        if lines and length + len(line) + 1 > MESSAGE_LIMIT:
+            break
+        lines.append(line)
+        length += len(line) + 1
+    batch = events[:len(lines)]
+    header = (f"🆕 Yangi foydalanuvchilar: {len(batch)}\n"
+              f"🕐 {batch[0]['time']} — {batch[-1]['time'][11:]}\n")
+    return header + "\n" + "\n".join(lines), len(batch)
+
+
+class NewUserDigest:
+    """Deduplicates new-user events and posts them in periodic digests"""
+
+    def __init__(self, path: str, interval: float = NOTIFY_DIGEST_INTERVAL,
+                 max_batch: int = NOTIFY_DIGEST_MAX_BATCH):
+        self.interval = interval
+        self.max_batch = max(1, max_batch)
+        self._journal = Journal(path)
+        # {'queued': event} when a user is added, {'user_id': ...} once they were sent
+        queued = {}
+        self._seen = set()
+        for record in self._journal.replay():
+            if 'queued' in record:
+                queued[record['queued']['user_id']] = record['queued']
+            else:
+                self._seen.add(record['user_id'])
+                queued.pop(record['user_id'], None)
+        self._pending = list(queued.values())
+        self._seen.update(queued)
+        self._send = None
+        self._batch_full = None
+        self._task = None
+
+    @property
+    def pending(self) -> int:
+        """Users waiting for the next digest"""
+        return len(self._pending)
+
+    def add(self, user_id: int, full_name: str, username: str = None, source_channel: str = None) -> bool:
+        """Queue a new user, return False if the user was already announced"""
+        if user_id in self._seen:
+            return False
+        event = {
+            'user_id': user_id,
+            'full_name': full_name,
+            'username': username,
+            'source_channel': source_channel,
+            'time': datetime.now().strftime(TIME_FORMAT),
+        }
+        self._seen.add(user_id)
+        self._journal.append({'queued': event})
+        self._pending.append(event)
+        if len(self._pending) >= self.max_batch and self._batch_full is not None:
+            self._batch_full.set()
+        return True
+
+    async def start(self, send):
+        """Start posting digests with send(text=...), e.g. a bound bot.send_message"""
+        self._send = send
+        self._batch_full = asyncio.Event()
+        self._task = asyncio.create_task(self._run(), name="admin-digest")
+
+    async def stop(self):
+        """Post the users still waiting and stop (unsent users are queued again on the next start)"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+            while await self.flush():
+                pass
+        self._journal.close()
+
+    async def flush(self) -> int:
+        """Post one digest of up to max_batch waiting users, return how many were posted"""
+        if not self._pending or self._send is None:
+            return 0
+        text, count = format_digest(self._pending[:self.max_batch])
+        try:
+            await self._send(text=text)
+        except RetryAfter as e:
+            logger.warning(f"Admin digest postponed by flood control ({e.retry_after}s)")
+            await asyncio.sleep(e.retry_after)
+            return 0
+        except TelegramError as e:
+            # Keep the users for the next digest
+            logger.error(f"Admin digest error: {e}")
+            return 0
+        for event in self._pending[:count]:
+            self._journal.append({'user_id': event['user_id']})
+        del self._pending[:count]
+        return count
+
+    async def _run(self):
+        """Post a digest every interval, or earlier when a batch is full"""
+        last_sent = 0.0
+        while True:
+            try:
+                await asyncio.wait_for(self._batch_full.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._batch_full.clear()
+            await asyncio.sleep(max(0.0, last_sent + MIN_DIGEST_GAP - time.monotonic()))
+            await self.flush()
+            last_sent = time.monotonic()
+            if len(self._pending) >= self.max_batch:
+                self._batch_full.set()
@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Rasch model estimation (joint maximum likelihood)
+Works on the 0/1 response matrix from grading.grade_test.
+
+In the Rasch model the raw score is a sufficient statistic, so all persons
+with the same score share one ability estimate. The Newton-Raphson
+iterations therefore run on score groups (at most items + 1 rows) instead
+of on every examinee; the full matrix is only read a few times to find
+extreme scores and to compute fit statistics.
+"""
+
+from typing import NamedTuple
+
+import numpy as np
+
+# Score used instead of 0 / maximum for extreme persons and items
+EXTREME_SCORE_ADJUSTMENT = 0.3
+
+MAX_ITERATIONS = 100
+TOLERANCE = 1e-4
+
+# Largest Newton step in logits (keeps early iterations stable)
+MAX_STEP = 1.0
+
+
+class RaschEstimate(NamedTuple):
+    """Rasch measures in logits with standard errors and fit statistics"""
+    item_difficulty: np.ndarray
+    item_se: np.ndarray
+    item_infit: np.ndarray
+    item_outfit: np.ndarray
+    person_ability: np.ndarray
+    person_se: np.ndarray
+    person_infit: np.ndarray
+    person_outfit: np.ndarray
+    iterations: int
+    converged: bool
+
+
+def _expit(x):
+    """Logistic function"""
+    return 1.0 / (1.0 + np.exp(-x))
+
+
+def _ability_for_scores(scores: np.ndarray, difficulty: np.ndarray) -> np.ndarray:
+    """Maximum likelihood ability for each (possibly fractional) raw score"""
+    max_score = len(difficulty)
+    theta = np.log(scores / (max_score - scores))
+    for _ in range(MAX_ITERATIONS):
+        p = _expit(theta[:, None] - difficulty[None, :])
+        step = (scores - p.sum(axis=1)) / (p * (1 - p)).sum(axis=1)
+        theta += np.clip(step, -MAX_STEP, MAX_STEP)
+        if np.abs(step).max() < TOLERANCE:
+            break
+    return theta
+
+
+def estimate(responses: np.ndarray) -> RaschEstimate:
+    """
+    Estimate item difficulties and person abilities
+    responses: (persons, items) 0/1 matrix
+    Extreme persons / items (all or nothing correct) get measures for a
+    score of 0.3 from the extreme, estimated against the other measures.
+    """
+    x = np.asarray(responses, dtype=np.float64)
+    n_persons, n_items = x.shape
+
+    # Exclude extreme items and persons (repeat: removing one can make another extreme)
+    items = np.ones(n_items, dtype=bool)
+    persons = np.ones(n_persons, dtype=bool)
+    while True:
+        person_scores = x @ items
+        new_persons = (person_scores > 0) & (person_scores < items.sum())
+        item_scores = new_persons @ x
+        new_items = items & (item_scores > 0) & (item_scores < new_persons.sum())
+        if (new_persons == persons).all() and (new_items == items).all():
+            break
+        persons, items = new_persons, new_items
+
+    n_active = int(items.sum())
+    n_estimated = int(persons.sum())
+    difficulty = np.zeros(n_items)
+    iterations, converged = 0, True
+
+    if n_active >= 2 and n_estimated >= 2:
+        converged = False
+        item_scores = item_scores[items]
+        group_sizes = np.bincount(person_scores[persons].astype(np.intp), minlength=n_active + 1)
+        group_scores = np.nonzero(group_sizes)[0].astype(float)
+        group_sizes = group_sizes[group_sizes > 0].astype(float)
+
+        b = np.log((n_estimated - item_scores) / item_scores)
+        b -= b.mean()
+        theta = np.log(group_scores / (n_active - group_scores))
+
+        for iterations in range(1, MAX_ITERATIONS + 1):
+            # Persons (score groups)
+            p = _expit(theta[:, None] - b[None, :])
+            theta_step = np.clip((group_scores - p.sum(axis=1)) / (p * (1 - p)).sum(axis=1), -MAX_STEP, MAX_STEP)
+            theta += theta_step
+
+            # Items
+            p = _expit(theta[:, None] - b[None, :])
+            expected = group_sizes @ p
+            information = group_sizes @ (p * (1 - p))
+            b_step = np.clip((expected - item_scores) / information, -MAX_STEP, MAX_STEP)
+            b += b_step
+            b -= b.mean()
+
+            if max(np.abs(theta_step).max(), np.abs(b_step).max()) < TOLERANCE:
+                converged = True
+                break
+
+        # JML bias correction
+        b *= (n_active - 1) / n_active
+        difficulty[items] = b
+
+        # Extreme items: measure for a score 0.3 away from the extreme
+        if not items.all():
+            abilities = np.repeat(_ability_for_scores(group_scores, b), group_sizes.astype(np.intp))
+            all_item_scores = persons @ x
+            for i in np.nonzero(~items)[0]:
+                score = min(max(all_item_scores[i], EXTREME_SCORE_ADJUSTMENT),
+                            n_estimated - EXTREME_SCORE_ADJUSTMENT)
+                difficulty[i] = _difficulty_for_score(score, abilities)
+
+    # Person measures for every possible raw score over all items
+    scores = np.arange(n_items + 1, dtype=float)
+    scores[0] = EXTREME_SCORE_ADJUSTMENT
+    scores[-1] = n_items - EXTREME_SCORE_ADJUSTMENT
+    score_ability = _ability_for_scores(scores, difficulty)
+
+    # Expected responses and variances per raw score group
+    p = _expit(score_ability[:, None] - difficulty[None, :])
+    w = p * (1 - p)
+    score_se = 1 / np.sqrt(w.sum(axis=1))
+
+    raw_scores = x.sum(axis=1).astype(np.intp)
+    group_sizes = np.bincount(raw_scores, minlength=n_items + 1)
+    person_ability = score_ability[raw_scores]
+    person_se = score_se[raw_scores]
+
+    # Fit statistics without building the full residual matrix:
+    # for binary x, (x - E)^2 = x * (1 - 2E) + E^2, and E only depends on
+    # the score group, so work on the persons of one score group at a time
+    a = 1 - 2 * p
+    a_w = a / w
+    correct_by_group = np.zeros((n_items + 1, n_items))
+    person_squared = np.empty(n_persons)
+    person_standardized = np.empty(n_persons)
+    order = np.argsort(raw_scores, kind='stable')
+    x_sorted = x[order]
+    end = 0
+    for score in np.nonzero(group_sizes)[0]:
+        start, end = end, end + group_sizes[score]
+        block = x_sorted[start:end]
+        correct_by_group[score] = block.sum(axis=0)
+        products = block @ np.column_stack((a[score], a_w[score]))
+        person_squared[order[start:end]] = products[:, 0]
+        person_standardized[order[start:end]] = products[:, 1]
+
+    group_sizes = group_sizes.astype(float)
+    item_information = group_sizes @ w
+    item_infit = ((correct_by_group * a).sum(axis=0) + group_sizes @ (p ** 2)) / item_information
+    item_outfit = ((correct_by_group * a_w).sum(axis=0) + group_sizes @ (p ** 2 / w)) / n_persons
+    item_se = 1 / np.sqrt(item_information)
+
+    person_infit = (person_squared + (p ** 2).sum(axis=1)[raw_scores]) / w.sum(axis=1)[raw_scores]
+    person_outfit = (person_standardized + (p ** 2 / w).sum(axis=1)[raw_scores]) / n_items
+
+    return RaschEstimate(
+        item_difficulty=difficulty,
+        item_se=item_se,
+        item_infit=item_infit,
+        item_outfit=item_outfit,
+        person_ability=person_ability,
+        person_se=person_se,
+        person_infit=person_infit,
+        person_outfit=person_outfit,
+        iterations=iterations,
+        converged=converged,
+    )
+
+
+def _difficulty_for_score(score: float, abilities: np.ndarray) -> float:
+    """Maximum likelihood difficulty of an item with the given (fractional) score"""
+    n = len(abilities)
+    b = np.log((n - score) / score) + abilities.mean()
+    for _ in range(MAX_ITERATIONS):
+        p = _expit(abilities - b)
+        step = (p.sum() - score) / (p * (1 - p)).sum()
+        b += np.clip(step, -MAX_STEP, MAX_STEP)
+        if abs(step) < TOLERANCE:
+            break
+    return float(b)
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Paged admin reports
+A report is an index of row keys built once; only the rows of the
+requested page are rendered, so a page costs the same however large the
+test is. Pages are browsed with ◀ ▶ buttons whose callback data carries
+the report id and the page number.
+"""
+
+import os
+from collections import OrderedDict
+
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup
+
+# Rows shown on one page
+PAGE_SIZE = int(os.getenv('REPORT_PAGE_SIZE', '20'))
+
+# Report indexes kept in memory
+MAX_REPORTS = int(os.getenv('REPORT_CACHE_SIZE', '32'))
+
+# Telegram's limit for message text
+MESSAGE_LIMIT = 4096
+
+CALLBACK_PREFIX = "page_"
+NOOP_CALLBACK = "page_noop"
+
+
+def page_callback(report_id: str, page: int) -> str:
+    """Callback data of a page button"""
+    return f"{CALLBACK_PREFIX}{page}_{report_id}"
+
+
+def parse_page_callback(data: str) -> tuple:
+    """(report_id, page) from page button callback data"""
+    page, report_id = data[len(CALLBACK_PREFIX):].split('_', 1)
+    return report_id, int(page)
+
+
+def fit_message(text: str) -> str:
+    """Cut text to Telegram's message limit"""
+    if len(text) <= MESSAGE_LIMIT:
+        return text
+    return text[:MESSAGE_LIMIT - 1] + "…"
+
+
+class ReportPages:
+    """LRU of report indexes: report_id -> (header, row keys)"""
+
+    def __init__(self, page_size: int = PAGE_SIZE, max_reports: int = MAX_REPORTS):
+        self.page_size = page_size
+        self.max_reports = max_reports
+        self._reports = OrderedDict()
+
+    def put(self, report_id: str, header: str, rows: list):
+        """Store the index of a report"""
+        self._reports[report_id] = (header, rows)
+        self._reports.move_to_end(report_id)
+        while len(self._reports) > self.max_reports:
+            self._reports.popitem(last=False)
+
+    def has(self, report_id: str) -> bool:
+        """Whether the index of a report is cached"""
+        return report_id in self._reports
+
+    def render(self, report_id: str, page: int, render_rows) -> tuple:
+        """
+        Return (text, reply_markup) of one page
+        render_rows(rows, first_number) renders the row keys of the page
+        (first_number is the 1-based position of the first row).
+        """
+        header, rows = self._reports[report_id]
+        self._reports.move_to_end(report_id)
+
+        pages = max(1, -(-len(rows) // self.page_size))
+        page = min(max(page, 0), pages - 1)
+        start = page * self.page_size
+        body = render_rows(rows[start:start + self.page_size], start + 1)
+
+        text = f"{header}\n\n{body}"
+        if pages > 1:
+            text += f"\n\n📄 Sahifa {page + 1}/{pages}"
+        return fit_message(text), self._navigation(report_id, page, pages)
+
+    @staticmethod
+    def _navigation(report_id: str, page: int, pages: int):
+        """◀ n/m ▶ buttons, or None for a single page"""
+        if pages == 1:
+            return None
+        buttons = []
+        if page > 0:
+            buttons.append(InlineKeyboardButton("◀", callback_data=page_callback(report_id, page - 1)))
+        buttons.append(InlineKeyboardButton(f"{page + 1}/{pages}", callback_data=NOOP_CALLBACK))
+        if page < pages - 1:
+            buttons.append(InlineKeyboardButton("▶", callback_data=page_callback(report_id, page + 1)))
+        return InlineKeyboardMarkup([buttons])
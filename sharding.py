@@ -0,0 +1,304 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Multi-process mode: a webhook front process and user-sharded workers
+With SHARD_WORKERS=N (and WEBHOOK_URL set) telegram_bot.py becomes a front
+process: it receives Telegram's webhook requests and forwards each update
+to worker process user_id % N, so a user's conversation state always
+lives in the same worker. Admins are always sent to worker 0, which alone
+runs scheduled checks and keeps admin reports and analysis caches.
+Workers are telegram_bot.py processes started by the front (SHARD_INDEX
+set); they share tests and registrations through the SQLite store.
+Updates travel over a local TCP connection per worker, each framed as a
+4-byte length followed by the update JSON.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import signal
+import struct
+import subprocess
+import sys
+
+logger = logging.getLogger(__name__)
+
+# Number of worker processes (0 = single process)
+SHARD_WORKERS = int(os.getenv('SHARD_WORKERS', '0'))
+
+# Set by the front process in each worker's environment
+SHARD_INDEX = int(os.environ['SHARD_INDEX']) if os.getenv('SHARD_INDEX') else None
+
+# Worker i receives updates on SHARD_HOST:SHARD_BASE_PORT+i
+SHARD_HOST = os.getenv('SHARD_HOST', '127.0.0.1')
+SHARD_BASE_PORT = int(os.getenv('SHARD_BASE_PORT', '8600'))
+
+# Seconds between checks of the store for tests added on another worker
+SHARD_SYNC_INTERVAL = float(os.getenv('SHARD_SYNC_INTERVAL', '2'))
+
+# Worker that handles admins, scheduled checks and admin reports
+PRIMARY_SHARD = 0
+
+# Seconds the front keeps retrying a worker that is not accepting connections
+CONNECT_TIMEOUT = 30.0
+
+# Seconds workers get to finish their updates on shutdown
+STOP_TIMEOUT = 30.0
+
+FRAME_HEADER = struct.Struct('>I')
+
+# Update fields that carry the user who sent the update
+USER_FIELDS = ('message', 'edited_message', 'callback_query', 'inline_query',
+               'chosen_inline_result', 'shipping_query', 'pre_checkout_query',
+               'poll_answer', 'my_chat_member', 'chat_member', 'chat_join_request')
+
+
+def is_primary() -> bool:
+    """Whether this process runs scheduled checks (the only process, or worker 0)"""
+    return SHARD_INDEX is None or SHARD_INDEX == PRIMARY_SHARD
+
+
+def update_user_id(update: dict):
+    """user_id of the sender of an update (JSON) or None"""
+    for field in USER_FIELDS:
+        value = update.get(field)
+        if isinstance(value, dict):
+            sender = value.get('from') or value.get('user')
+            if isinstance(sender, dict) and 'id' in sender:
+                return sender['id']
+    return None
+
+
+def shard_of(update: dict, workers: int, admin_ids=()) -> int:
+    """Worker that handles an update"""
+    user_id = update_user_id(update)
+    if user_id is None or user_id in admin_ids:
+        return PRIMARY_SHARD
+    return user_id % workers
+
+
+# Front process
+class ShardLink:
+    """Connection from the front to one worker"""
+
+    def __init__(self, index: int, host: str = SHARD_HOST, port: int = None):
+        self.index = index
+        self.host = host
+        self.port = port if port is not None else SHARD_BASE_PORT + index
+        self.forwarded = 0
+        self._writer = None
+        self._lock = asyncio.Lock()
+
+    async def _connect(self):
+        """Open the connection, waiting for a starting worker"""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + CONNECT_TIMEOUT
+        while True:
+            try:
+                _, self._writer = await asyncio.open_connection(self.host, self.port)
+                return
+            except OSError:
+                if loop.time() >= deadline:
+                    raise
+                await asyncio.sleep(0.2)
+
+    async def send(self, body: bytes):
+        """Forward one update, reconnecting once if the worker was restarted"""
+        async with self._lock:
+            for attempt in (1, 2):
+                try:
+                    if self._writer is None:
+                        await self._connect()
+                    self._writer.write(FRAME_HEADER.pack(len(body)) + body)
+                    await self._writer.drain()
+                    self.forwarded += 1
+                    return
+                except (OSError, ConnectionError):
+                    self.close()
+                    if attempt == 2:
+                        raise
+
+    def close(self):
+        """Drop the connection"""
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+
+class ShardFront:
+    """Webhook endpoint that forwards updates to the worker processes"""
+
+    def __init__(self, script: str, workers: int, admin_ids=(), secret_token: str = None):
+        self.script = script
+        self.workers = workers
+        self.admin_ids = frozenset(admin_ids)
+        self.secret_token = secret_token
+        self.links = [ShardLink(index) for index in range(workers)]
+        self.processes = [None] * workers
+
+    # Worker processes
+    def worker_env(self, index: int) -> dict:
+        """Environment of worker index"""
+        env = dict(os.environ, SHARD_INDEX=str(index), SHARD_WORKERS=str(self.workers))
+        if env.get('METRICS_PORT'):
+            # Every worker serves its own metrics on consecutive ports
+            env['METRICS_PORT'] = str(int(env['METRICS_PORT']) + index)
+        return env
+
+    def start_worker(self, index: int):
+        """Start (or restart) worker index"""
+        self.processes[index] = subprocess.Popen([sys.executable, self.script], env=self.worker_env(index))
+        logger.info(f"Worker {index} started (pid {self.processes[index].pid}, "
+                    f"port {self.links[index].port})")
+
+    def restart_exited_workers(self):
+        """Restart workers that failed while the front is running (a stopped worker exits with 0)"""
+        for index, process in enumerate(self.processes):
+            if process is not None and process.poll() not in (None, 0):
+                logger.error(f"Worker {index} exited with code {process.returncode}, restarting")
+                self.links[index].close()
+                self.start_worker(index)
+
+    def stop_workers(self):
+        """Ask every worker to finish and wait for them"""
+        for process in self.processes:
+            if process is not None and process.poll() is None:
+                process.send_signal(signal.SIGTERM)
+        for index, process in enumerate(self.processes):
+            if process is None:
+                continue
+            try:
+                process.wait(timeout=STOP_TIMEOUT)
+            except subprocess.TimeoutExpired:
+                logger.error(f"Worker {index} did not stop, killing it")
+                process.kill()
+
+    # Updates
+    async def dispatch(self, body: bytes) -> int:
+        """Forward a webhook request body to its worker, return the worker index"""
+        update = json.loads(body)
+        if not isinstance(update, dict):
+            raise ValueError("update is not a JSON object")
+        index = shard_of(update, self.workers, self.admin_ids)
+        await self.links[index].send(body)
+        return index
+
+    def make_app(self, url_path: str):
+        """tornado application answering Telegram's webhook requests"""
+        import tornado.web
+
+        front = self
+
+        class UpdateHandler(tornado.web.RequestHandler):
+            """POST of one update"""
+
+            async def post(self):
+                token = self.request.headers.get('X-Telegram-Bot-Api-Secret-Token')
+                if front.secret_token is not None and token != front.secret_token:
+                    self.set_status(403)
+                    return
+                try:
+                    await front.dispatch(self.request.body)
+                except ValueError:
+                    self.set_status(400)
+                except (OSError, ConnectionError) as e:
+                    # Telegram retries the update later
+                    logger.error(f"Cannot forward update to a worker: {e}")
+                    self.set_status(503)
+
+        return tornado.web.Application([(rf"/{url_path.strip('/')}/?", UpdateHandler)])
+
+    async def serve(self, bot, listen: str, port: int, url_path: str, webhook_url: str,
+                    max_connections: int, allowed_updates: list):
+        """Receive updates until SIGINT / SIGTERM"""
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(signum, stop.set)
+
+        server = self.make_app(url_path).listen(port, address=listen)
+        async with bot:
+            await bot.set_webhook(
+                url=webhook_url,
+                secret_token=self.secret_token,
+                max_connections=max_connections,
+                allowed_updates=allowed_updates,
+            )
+        logger.info(f"Front started (webhook on {listen}:{port}/{url_path}, {self.workers} workers)")
+
+        while not stop.is_set():
+            try:
+                await asyncio.wait_for(stop.wait(), timeout=1.0)
+            except asyncio.TimeoutError:
+                self.restart_exited_workers()
+
+        server.stop()
+        for link in self.links:
+            link.close()
+        logger.info(f"Updates forwarded per worker: {[link.forwarded for link in self.links]}")
+
+    def run(self, bot, **webhook):
+        """Start the workers and serve webhook requests until stopped"""
+        for index in range(self.workers):
+            self.start_worker(index)
+        try:
+            asyncio.run(self.serve(bot, **webhook))
+        finally:
+            self.stop_workers()
+
+
+# Worker process
+async def _receive_updates(application, connections: set, reader, writer):
+    """Put every update forwarded by the front into the application's update queue"""
+    from telegram import Update
+
+    connections.add(writer)
+    try:
+        while True:
+            header = await reader.readexactly(FRAME_HEADER.size)
+            body = await reader.readexactly(FRAME_HEADER.unpack(header)[0])
+            try:
+                update = Update.de_json(json.loads(body), application.bot)
+            except ValueError as e:
+                logger.error(f"Dropping malformed update: {e}")
+                continue
+            await application.update_queue.put(update)
+    except (asyncio.IncompleteReadError, ConnectionError):
+        pass
+    finally:
+        connections.discard(writer)
+        writer.close()
+
+
+async def serve_shard(application, index: int = SHARD_INDEX):
+    """Run the application on updates forwarded by the front until SIGINT / SIGTERM"""
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signum, stop.set)
+
+    await application.initialize()
+    if application.post_init is not None:
+        await application.post_init(application)
+    await application.start()
+
+    connections = set()
+    server = await asyncio.start_server(
+        lambda reader, writer: _receive_updates(application, connections, reader, writer),
+        SHARD_HOST, SHARD_BASE_PORT + index
+    )
+    logger.info(f"Worker {index} receiving updates on {SHARD_HOST}:{SHARD_BASE_PORT + index}")
+
+    await stop.wait()
+
+    server.close()
+    for writer in list(connections):
+        writer.close()
+    await server.wait_closed()
+    await application.stop()
+    if application.post_stop is not None:
+        await application.post_stop(application)
+    await application.shutdown()
+    if application.post_shutdown is not None:
+        await application.post_shutdown(application)
@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Persistence of conversation states and user_data across restarts
+A PTB BasePersistence that keeps a binary snapshot plus an append-only
+change log, like the registrations journal of the JSON store:
+  <path>.bin - MAGIC + one pickle of (user_data, conversations)
+  <path>.log - frames of a 4-byte length + a pickled list of changes
+Each persistence update appends only the users and conversations whose
+value changed since they were last written (PTB passes every user that
+sent an update), with one write and fsync. When the log outgrows the
+snapshot it is compacted into a new snapshot. At startup the snapshot is
+unpickled in one call and the short log is replayed on top of it.
+"""
+
+import asyncio
+import logging
+import os
+import pickle
+import struct
+
+from telegram.ext import BasePersistence, PersistenceInput
+
+logger = logging.getLogger(__name__)
+
+# Seconds between two persistence updates (PTB collects the changes in between)
+STATE_UPDATE_INTERVAL = float(os.getenv('STATE_UPDATE_INTERVAL', '5'))
+
+# Log size that always allows a compaction (a larger snapshot waits for a larger log)
+STATE_COMPACT_BYTES = int(os.getenv('STATE_COMPACT_BYTES', str(1024 * 1024)))
+
+MAGIC = b'TBS1'
+FRAME_HEADER = struct.Struct('>I')
+
+# Change records
+SET_USER, DROP_USER, SET_STATE = 'u', 'd', 'c'
+
+
+class StatePersistence(BasePersistence):
+    """user_data and ConversationHandler states in a snapshot + change log"""
+
+    def __init__(self, path: str, update_interval: float = STATE_UPDATE_INTERVAL,
+                 compact_bytes: int = STATE_COMPACT_BYTES):
+        super().__init__(
+            store_data=PersistenceInput(bot_data=False, chat_data=False, user_data=True, callback_data=False),
+            update_interval=update_interval,
+        )
+        self.snapshot_path = f"{path}.bin"
+        self.log_path = f"{path}.log"
+        self.compact_bytes = compact_bytes
+        self.user_data = {}       # user_id -> last written user_data
+        self.conversations = {}   # handler name -> {key: state}
+        self._snapshot_size = 0
+        self._log_size = 0
+        self._pending = []
+        self._commit_handle = None
+        self._file = None
+        self._load()
+
+    # Loading
+    def _load(self):
+        """Read the snapshot and replay the log"""
+        if os.path.exists(self.snapshot_path):
+            try:
+                with open(self.snapshot_path, 'rb') as f:
+                    data = f.read()
+                if data[:len(MAGIC)] != MAGIC:
+                    raise ValueError("unknown format")
+                self.user_data, self.conversations = pickle.loads(data[len(MAGIC):])
+                self._snapshot_size = len(data)
+            except (OSError, ValueError, pickle.UnpicklingError, EOFError) as e:
+                logger.error(f"Error loading {self.snapshot_path}: {e}")
+
+        if not os.path.exists(self.log_path):
+            return
+        with open(self.log_path, 'rb') as f:
+            data = f.read()
+        position = 0
+        while position + FRAME_HEADER.size <= len(data):
+            (length,) = FRAME_HEADER.unpack_from(data, position)
+            end = position + FRAME_HEADER.size + length
+            if end > len(data):
+                break
+            try:
+                changes = pickle.loads(data[position + FRAME_HEADER.size:end])
+            except (pickle.UnpicklingError, EOFError, ValueError):
+                break
+            for change in changes:
+                self._apply(change)
+            position = end
+        if position < len(data):
+            # A crash during a write leaves at most one torn frame at the end
+            logger.warning(f"Ignoring {len(data) - position} damaged bytes at the end of {self.log_path}")
+            with open(self.log_path, 'r+b') as f:
+                f.truncate(position)
+        self._log_size = position
+
+    def _apply(self, change: tuple):
+        """Apply one change record to the in-memory state"""
+        kind = change[0]
+        if kind == SET_USER:
+            self.user_data[change[1]] = change[2]
+        elif kind == DROP_USER:
+            self.user_data.pop(change[1], None)
+        elif kind == SET_STATE:
+            _, name, key, state = change
+            if state is None:
+                self.conversations.get(name, {}).pop(key, None)
+            else:
+                self.conversations.setdefault(name, {})[key] = state
+
+    # Reads (once at startup)
+    async def get_user_data(self) -> dict:
+        """Stored user_data of all users"""
+        return {user_id: dict(data) for user_id, data in self.user_data.items()}
+
+    async def get_chat_data(self) -> dict:
+        """chat_data is not stored"""
+        return {}
+
+    async def get_bot_data(self) -> dict:
+        """bot_data is not stored"""
+        return {}
+
+    async def get_callback_data(self):
+        """Callback data is not stored"""
+        return None
+
+    async def get_conversations(self, name: str) -> dict:
+        """Stored states of one ConversationHandler"""
+        return dict(self.conversations.get(name, {}))
+
+    # Changes
+    async def update_user_data(self, user_id: int, data: dict) -> None:
+        """Record a user's data if it changed"""
+        if self.user_data.get(user_id) == data:
+            return
+        self.user_data[user_id] = data
+        self._record((SET_USER, user_id, data))
+
+    async def drop_user_data(self, user_id: int) -> None:
+        """Forget a user's data"""
+        if self.user_data.pop(user_id, None) is not None:
+            self._record((DROP_USER, user_id))
+
+    async def update_conversation(self, name: str, key, new_state) -> None:
+        """Record a conversation state if it changed (None ends the conversation)"""
+        states = self.conversations.get(name, {})
+        if states.get(key) == new_state:
+            return
+        self._apply((SET_STATE, name, key, new_state))
+        self._record((SET_STATE, name, key, new_state))
+
+    async def update_chat_data(self, chat_id: int, data: dict) -> None:
+        """chat_data is not stored"""
+
+    async def update_bot_data(self, data: dict) -> None:
+        """bot_data is not stored"""
+
+    async def update_callback_data(self, data) -> None:
+        """Callback data is not stored"""
+
+    async def drop_chat_data(self, chat_id: int) -> None:
+        """chat_data is not stored"""
+
+    async def refresh_user_data(self, user_id: int, user_data: dict) -> None:
+        """user_data only changes in this process"""
+
+    async def refresh_chat_data(self, chat_id: int, chat_data: dict) -> None:
+        """chat_data is not stored"""
+
+    async def refresh_bot_data(self, bot_data: dict) -> None:
+        """bot_data is not stored"""
+
+    async def flush(self) -> None:
+        """Write pending changes and compact the log before exit"""
+        self.commit()
+        if self._log_size:
+            self.compact()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    # Log
+    def _record(self, change: tuple):
+        """Queue a change, it is written with the next commit"""
+        self._pending.append(change)
+        if self._commit_handle is not None:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.commit()
+            return
+        # All changes of one persistence update are written together
+        self._commit_handle = loop.call_soon(self.commit)
+
+    def commit(self):
+        """Append pending changes as one frame with a single fsync"""
+        if self._commit_handle is not None:
+            self._commit_handle.cancel()
+            self._commit_handle = None
+        if not self._pending:
+            return
+
+        frame = pickle.dumps(self._pending, protocol=pickle.HIGHEST_PROTOCOL)
+        self._pending = []
+        try:
+            if self._file is None:
+                self._file = open(self.log_path, 'ab')
+            self._file.write(FRAME_HEADER.pack(len(frame)) + frame)
+            self._file.flush()
+            os.fsync(self._file.fileno())
+        except OSError as e:
+            logger.error(f"Error writing {self.log_path}: {e}")
+            return
+        self._log_size += FRAME_HEADER.size + len(frame)
+
+        if self._log_size >= max(self.compact_bytes, self._snapshot_size):
+            self.compact()
+
+    def compact(self):
+        """Write a new snapshot and start an empty log"""
+        data = MAGIC + pickle.dumps((self.user_data, self.conversations), protocol=pickle.HIGHEST_PROTOCOL)
+        tmp_path = f"{self.snapshot_path}.tmp"
+        try:
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.snapshot_path)
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            with open(self.log_path, 'wb') as f:
+                os.fsync(f.fileno())
+        except OSError as e:
+            logger.error(f"Error compacting {self.snapshot_path}: {e}")
+            return
+        self._snapshot_size = len(data)
+        self._log_size = 0
@@ -0,0 +1,650 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Data storage for the Telegram test bot
+Two backends are available, selected with the STORAGE_BACKEND variable:
+  json   - collections are loaded once, served from memory and flushed
+           to bot_data/*.json in the background (write-behind);
+           registration events go to an append-only journal that is
+           compacted into registrations.json; users are kept in a
+           compact registry (user_registry.py)
+  sqlite - one indexed row per user, test and registration in an SQLite
+           database, so a single submission is a single row update
+Registrations reference their user by user_id; names are only stored in
+the user record (full_name() resolves them).
+"""
+
+import asyncio
+import contextlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+
+from journal import Journal
+from user_registry import UserRegistry
+
+logger = logging.getLogger(__name__)
+
+# Storage backend: "json" or "sqlite"
+STORAGE_BACKEND = os.getenv('STORAGE_BACKEND', 'json').lower()
+
+# SQLite database file name (inside the data directory)
+SQLITE_FILENAME = os.getenv('SQLITE_FILENAME', 'bot.db')
+
+# Seconds an SQLite statement blocks while another process holds the write lock
+# (kept short: the persistence writer retries a busy transaction asynchronously)
+SQLITE_BUSY_TIMEOUT = float(os.getenv('SQLITE_BUSY_TIMEOUT', '0.05'))
+
+# Seconds to wait before writing changed collections to disk
+FLUSH_INTERVAL = float(os.getenv('STORE_FLUSH_INTERVAL', '2.0'))
+
+# Journal events after which registrations.json is rewritten
+COMPACT_EVENTS = int(os.getenv('JOURNAL_COMPACT_EVENTS', '10000'))
+
+COLLECTIONS = ('users', 'tests', 'registrations')
+
+
+class StoreBusy(Exception):
+    """Another process holds the database write lock, the transaction can be retried"""
+
+
+# Data management functions
+def load_data(filename):
+    """Load data from JSON file"""
+    if os.path.exists(filename):
+        try:
+            with open(filename, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            logger.error(f"Error loading {filename}: {e}")
+            return {}
+    return {}
+
+
+def save_data(filename, data):
+    """Save data to JSON file"""
+    # Write to a temporary file first so a crash never leaves a truncated file
+    tmp_filename = f"{filename}.tmp"
+    with open(tmp_filename, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_filename, filename)
+
+
+class JsonStore:
+    """Process-wide in-memory store for users, tests and registrations"""
+
+    def __init__(self, data_dir: str, flush_interval: float = FLUSH_INTERVAL,
+                 compact_events: int = COMPACT_EVENTS):
+        os.makedirs(data_dir, exist_ok=True)
+        self.files = {name: os.path.join(data_dir, f"{name}.json") for name in COLLECTIONS}
+        self.flush_interval = flush_interval
+        self.compact_events = compact_events
+
+        self.users = UserRegistry(load_data(self.files['users']))
+        self.tests = load_data(self.files['tests'])
+
+        # registrations.json is the snapshot, the journal holds newer events
+        self.registrations = load_data(self.files['registrations'])
+        self.journal = Journal(os.path.join(data_dir, "registrations.journal"))
+        for event in self.journal.replay():
+            self._apply(event)
+        self._drop_copied_names()
+
+        self._dirty = set()
+        self._flush_handle = None
+        # Registrations snapshots: the newest one taken, written under the lock
+        self._snapshot_generation = 0
+        self._snapshot_lock = threading.Lock()
+        self._compaction = None
+        # users.json saves, the same scheme (the registry can hold millions of users)
+        self._users_generation = 0
+        self._users_lock = threading.Lock()
+        self._users_save = None
+
+    # Reads
+    def get_user(self, user_id):
+        """Return user record or None"""
+        return self.users.get(user_id)
+
+    def has_user(self, user_id) -> bool:
+        """Check if user is registered"""
+        return user_id in self.users
+
+    def full_name(self, user_id) -> str:
+        """'Name Surname' of a user (the user_id if the user is unknown)"""
+        return self.users.full_name(user_id) or f"ID {user_id}"
+
+    def get_tests(self) -> dict:
+        """Return all tests keyed by test_id"""
+        return self.tests
+
+    def get_test(self, test_id):
+        """Return test record or None"""
+        return self.tests.get(test_id)
+
+    def get_registrations(self, test_id=None) -> dict:
+        """Return registrations of one test, or of all tests if test_id is None"""
+        if test_id is None:
+            return self.registrations
+        return self.registrations.get(test_id, {})
+
+    def get_registration(self, test_id, user_id):
+        """Return one user's registration for a test or None"""
+        return self.registrations.get(test_id, {}).get(str(user_id))
+
+    def registration_counts(self, submitted: bool = False) -> dict:
+        """Number of registrations per test (only those with answers if submitted), empty tests left out"""
+        counts = {}
+        for test_id, test_registrations in self.registrations.items():
+            if submitted:
+                count = sum(1 for registration in test_registrations.values() if registration.get('answers'))
+            else:
+                count = len(test_registrations)
+            if count:
+                counts[test_id] = count
+        return counts
+
+    def registration_batches(self, test_id, batch_size: int):
+        """Yield registrations of a test as lists of (user_id, record)"""
+        registrations = self.registrations.get(test_id, {})
+        user_ids = list(registrations)
+        for start in range(0, len(user_ids), batch_size):
+            yield [(user_id, registrations[user_id]) for user_id in user_ids[start:start + batch_size]]
+
+    def registration_user_ids(self, test_id) -> list:
+        """user_ids registered for a test, without their records"""
+        return list(self.registrations.get(test_id, {}))
+
+    # Mutations
+    def add_user(self, user_id, user_data: dict):
+        """Create or replace a user record"""
+        self.users.add(user_id, user_data)
+        self._mark_dirty('users')
+
+    def add_test(self, test_id, test_data: dict):
+        """Create or replace a test"""
+        self.tests[test_id] = test_data
+        self._mark_dirty('tests')
+
+    def add_tests(self, tests: dict):
+        """Create or replace several tests at once"""
+        self.tests.update(tests)
+        self._mark_dirty('tests')
+
+    def register(self, test_id, user_id, registration: dict):
+        """Register user for a test"""
+        self._record({'op': 'register', 'test': test_id, 'user': str(user_id), 'data': registration})
+
+    def submit_answers(self, test_id, user_id, answers: str, submitted_at: str):
+        """Save user's answers for a test"""
+        if str(user_id) not in self.registrations.get(test_id, {}):
+            raise KeyError(f"User {user_id} is not registered for test {test_id}")
+        self._record({'op': 'submit', 'test': test_id, 'user': str(user_id),
+                      'answers': answers, 'at': submitted_at})
+
+    def set_scores(self, test_id, scores: dict):
+        """Save scores of a test, scores is {user_id: score}"""
+        scores = {str(user_id): score for user_id, score in scores.items()}
+        self._record({'op': 'scores', 'test': test_id, 'scores': scores})
+
+    # Registration journal
+    def _record(self, event: dict):
+        """Apply a registration event and append it to the journal"""
+        self._apply(event)
+        self.journal.append(event)
+        if self.journal.event_count >= self.compact_events:
+            self._mark_dirty('registrations')
+
+    def _apply(self, event: dict):
+        """Apply a registration event to the in-memory state (idempotent)"""
+        test_registrations = self.registrations.setdefault(event['test'], {})
+        op = event['op']
+        if op == 'register':
+            test_registrations[event['user']] = event['data']
+        elif op == 'submit':
+            registration = test_registrations.get(event['user'])
+            if registration is None:
+                logger.warning(f"Journal: submission of unregistered user {event['user']}")
+                return
+            registration['answers'] = event['answers']
+            registration['submitted_at'] = event['at']
+        elif op == 'scores':
+            for user_id, score in event['scores'].items():
+                if user_id in test_registrations:
+                    test_registrations[user_id]['score'] = score
+        else:
+            logger.warning(f"Journal: unknown event {op}")
+
+    def _drop_copied_names(self):
+        """Remove names copied into older registrations (the user record has them)"""
+        for test_registrations in self.registrations.values():
+            for user_id, registration in test_registrations.items():
+                if 'name' in registration and user_id in self.users:
+                    del registration['name']
+                    registration.pop('surname', None)
+
+    def compact(self):
+        """Write a registrations snapshot and empty the journal (blocking)"""
+        self._snapshot_generation += 1
+        self.journal.commit()
+        self._write_snapshot(self.registrations, self._snapshot_generation)
+        self.journal.reset()
+        self._dirty.discard('registrations')
+
+    async def compact_in_background(self):
+        """Compact without blocking the event loop: copy, then write the copy in a thread"""
+        self._snapshot_generation += 1
+        generation = self._snapshot_generation
+        self._dirty.discard('registrations')
+        try:
+            # Events from here on go to a new journal, the rotated one is covered by the copy
+            self.journal.rotate()
+            snapshot = {
+                test_id: {user_id: dict(registration) for user_id, registration in test_registrations.items()}
+                for test_id, test_registrations in self.registrations.items()
+            }
+            if await asyncio.to_thread(self._write_snapshot, snapshot, generation):
+                self.journal.drop_rotated()
+        except OSError as e:
+            # The rotated journal is kept and joined by the next compaction
+            logger.error(f"Error saving registrations: {e}")
+            self._mark_dirty('registrations')
+
+    def _write_snapshot(self, registrations: dict, generation: int) -> bool:
+        """Save a registrations snapshot unless a newer one was taken meanwhile"""
+        with self._snapshot_lock:
+            if generation != self._snapshot_generation:
+                return False
+            save_data(self.files['registrations'], registrations)
+            return True
+
+    def _save_users(self, background: bool):
+        """Write users.json, from a copy in a thread when the event loop runs"""
+        if self._users_save is not None and not self._users_save.done():
+            # Running, a later flush writes the newer users
+            self._mark_dirty('users')
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            background = False
+        self._users_generation += 1
+        if background:
+            self._users_save = loop.create_task(
+                self.save_users_in_background(self.users.snapshot(), self._users_generation)
+            )
+        else:
+            self._write_users(self.users, self._users_generation)
+
+    async def save_users_in_background(self, users: UserRegistry, generation: int):
+        """Write a copy of the registry in a thread"""
+        try:
+            await asyncio.to_thread(self._write_users, users, generation)
+        except OSError as e:
+            logger.error(f"Error saving users: {e}")
+            self._mark_dirty('users')
+
+    def _write_users(self, users: UserRegistry, generation: int) -> bool:
+        """Save users.json unless a newer save was started meanwhile"""
+        with self._users_lock:
+            if generation != self._users_generation:
+                return False
+            users.save(self.files['users'])
+            return True
+
+    # Persistence
+    def _mark_dirty(self, name: str):
+        """Mark collection as changed and schedule a flush"""
+        self._dirty.add(name)
+        if self._flush_handle is not None:
+            # A flush is already pending, it will pick this change up
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # No event loop (scripts, shutdown) - write immediately
+            self.flush()
+            return
+        self._flush_handle = loop.call_later(self.flush_interval, self.flush)
+
+    def transaction(self):
+        """Group mutations (in memory they are applied immediately)"""
+        return contextlib.nullcontext()
+
+    def commit(self):
+        """Make registration events durable now (users and tests stay write-behind)"""
+        self.journal.commit()
+
+    def flush(self, background: bool = True):
+        """Write all changed collections to disk"""
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+
+        self.journal.commit()
+
+        for name in list(self._dirty):
+            self._dirty.discard(name)
+            try:
+                if name == 'registrations':
+                    # Registrations are only rewritten as a journal compaction
+                    self._compact(background)
+                elif name == 'users':
+                    self._save_users(background)
+                else:
+                    save_data(self.files[name], getattr(self, name))
+            except OSError as e:
+                logger.error(f"Error saving {name}: {e}")
+                self._dirty.add(name)
+                break
+
+    def _compact(self, background: bool):
+        """Compact in a background task when the event loop runs, else right away"""
+        if self._compaction is not None and not self._compaction.done():
+            # Running, a later flush compacts the newer events
+            self._mark_dirty('registrations')
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            background = False
+        if background:
+            self._compaction = loop.create_task(self.compact_in_background())
+        else:
+            self.compact()
+
+    def close(self):
+        """Flush everything and compact the journal before exit"""
+        if self._compaction is not None:
+            # A newer snapshot below supersedes the one being written
+            self._compaction.cancel()
+            self._compaction = None
+        if self._users_save is not None:
+            # Same for a users.json save
+            self._users_save.cancel()
+            self._users_save = None
+        self.flush(background=False)
+        if self.journal.event_count or os.path.exists(self.journal.rotated_path):
+            self.compact()
+        self.journal.close()
+
+
+class SQLiteStore:
+    """SQLite store for users, tests and registrations"""
+
+    USER_COLUMNS = ('name', 'surname', 'username', 'registered_at')
+    TEST_COLUMNS = ('answers', 'deadline', 'check_time', 'created_at')
+    REGISTRATION_COLUMNS = ('registered_at', 'answers', 'score', 'submitted_at')
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS users (
+            user_id TEXT PRIMARY KEY,
+            name TEXT,
+            surname TEXT,
+            username TEXT,
+            registered_at TEXT
+        );
+        CREATE TABLE IF NOT EXISTS tests (
+            test_id TEXT PRIMARY KEY,
+            answers TEXT NOT NULL,
+            deadline TEXT NOT NULL,
+            check_time TEXT NOT NULL,
+            created_at TEXT
+        );
+        -- The (test_id, user_id) primary key is the lookup index;
+        -- name and surname are only filled in rows of older versions
+        CREATE TABLE IF NOT EXISTS registrations (
+            test_id TEXT NOT NULL,
+            user_id TEXT NOT NULL,
+            name TEXT,
+            surname TEXT,
+            registered_at TEXT,
+            answers TEXT,
+            score TEXT,
+            submitted_at TEXT,
+            PRIMARY KEY (test_id, user_id)
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS idx_registrations_user ON registrations (user_id, test_id);
+    """
+
+    def __init__(self, db_path: str):
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.db_path = db_path
+        # Statements are parameterized, sqlite3 keeps them prepared in its statement cache
+        # Several worker processes may share the database (see SHARD_WORKERS)
+        self.conn = sqlite3.connect(db_path, isolation_level=None, cached_statements=64,
+                                    timeout=SQLITE_BUSY_TIMEOUT)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(self.SCHEMA)
+
+    @staticmethod
+    def _record(row, columns) -> dict:
+        """Convert a row into a record dict"""
+        return {column: row[column] for column in columns}
+
+    # Reads
+    def get_user(self, user_id):
+        """Return user record or None"""
+        row = self.conn.execute(
+            "SELECT * FROM users WHERE user_id = ?", (str(user_id),)
+        ).fetchone()
+        return self._record(row, self.USER_COLUMNS) if row else None
+
+    def has_user(self, user_id) -> bool:
+        """Check if user is registered"""
+        row = self.conn.execute(
+            "SELECT 1 FROM users WHERE user_id = ?", (str(user_id),)
+        ).fetchone()
+        return row is not None
+
+    def full_name(self, user_id) -> str:
+        """'Name Surname' of a user (the user_id if the user is unknown)"""
+        row = self.conn.execute(
+            "SELECT name, surname FROM users WHERE user_id = ?", (str(user_id),)
+        ).fetchone()
+        return f"{row['name']} {row['surname']}" if row else f"ID {user_id}"
+
+    def get_tests(self) -> dict:
+        """Return all tests keyed by test_id"""
+        rows = self.conn.execute("SELECT * FROM tests ORDER BY rowid")
+        return {row['test_id']: self._record(row, self.TEST_COLUMNS) for row in rows}
+
+    def get_test(self, test_id):
+        """Return test record or None"""
+        row = self.conn.execute(
+            "SELECT * FROM tests WHERE test_id = ?", (test_id,)
+        ).fetchone()
+        return self._record(row, self.TEST_COLUMNS) if row else None
+
+    def get_registrations(self, test_id=None) -> dict:
+        """Return registrations of one test, or of all tests if test_id is None"""
+        if test_id is not None:
+            rows = self.conn.execute(
+                "SELECT * FROM registrations WHERE test_id = ?", (test_id,)
+            )
+            return {row['user_id']: self._record(row, self.REGISTRATION_COLUMNS) for row in rows}
+
+        registrations = {}
+        for row in self.conn.execute("SELECT * FROM registrations"):
+            registrations.setdefault(row['test_id'], {})[row['user_id']] = \
+                self._record(row, self.REGISTRATION_COLUMNS)
+        return registrations
+
+    def get_registration(self, test_id, user_id):
+        """Return one user's registration for a test or None"""
+        row = self.conn.execute(
+            "SELECT * FROM registrations WHERE test_id = ? AND user_id = ?", (test_id, str(user_id))
+        ).fetchone()
+        return self._record(row, self.REGISTRATION_COLUMNS) if row else None
+
+    def registration_counts(self, submitted: bool = False) -> dict:
+        """Number of registrations per test (only those with answers if submitted), empty tests left out"""
+        condition = "WHERE answers IS NOT NULL AND answers != ''" if submitted else ""
+        rows = self.conn.execute(
+            f"SELECT test_id, COUNT(*) FROM registrations {condition} GROUP BY test_id"
+        )
+        return {test_id: count for test_id, count in rows}
+
+    def registration_batches(self, test_id, batch_size: int):
+        """Yield registrations of a test as lists of (user_id, record), in user_id order"""
+        last_user_id = ''
+        while True:
+            rows = self.conn.execute(
+                "SELECT * FROM registrations WHERE test_id = ? AND user_id > ? ORDER BY user_id LIMIT ?",
+                (test_id, last_user_id, batch_size)
+            ).fetchall()
+            if not rows:
+                return
+            yield [(row['user_id'], self._record(row, self.REGISTRATION_COLUMNS)) for row in rows]
+            last_user_id = rows[-1]['user_id']
+
+    def registration_user_ids(self, test_id) -> list:
+        """user_ids registered for a test, without their records (read from the primary key index)"""
+        rows = self.conn.execute(
+            "SELECT user_id FROM registrations WHERE test_id = ? ORDER BY user_id", (test_id,)
+        )
+        return [user_id for user_id, in rows]
+
+    # Mutations
+    def add_user(self, user_id, user_data: dict):
+        """Create or replace a user record"""
+        self.conn.execute(
+            "INSERT OR REPLACE INTO users (user_id, name, surname, username, registered_at) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (str(user_id), *(user_data.get(c) for c in self.USER_COLUMNS))
+        )
+
+    def add_test(self, test_id, test_data: dict):
+        """Create or replace a test"""
+        self.conn.execute(
+            "INSERT OR REPLACE INTO tests (test_id, answers, deadline, check_time, created_at) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (test_id, *(test_data.get(c) for c in self.TEST_COLUMNS))
+        )
+
+    def add_tests(self, tests: dict):
+        """Create or replace several tests in one transaction"""
+        with self.transaction():
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO tests (test_id, answers, deadline, check_time, created_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                [(test_id, *(data.get(c) for c in self.TEST_COLUMNS)) for test_id, data in tests.items()]
+            )
+
+    def register(self, test_id, user_id, registration: dict):
+        """Register user for a test"""
+        self.conn.execute(
+            "INSERT OR REPLACE INTO registrations "
+            "(test_id, user_id, registered_at, answers, score, submitted_at) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (test_id, str(user_id), *(registration.get(c) for c in self.REGISTRATION_COLUMNS))
+        )
+
+    def submit_answers(self, test_id, user_id, answers: str, submitted_at: str):
+        """Save user's answers for a test"""
+        cursor = self.conn.execute(
+            "UPDATE registrations SET answers = ?, submitted_at = ? "
+            "WHERE test_id = ? AND user_id = ?",
+            (answers, submitted_at, test_id, str(user_id))
+        )
+        if cursor.rowcount == 0:
+            raise KeyError(f"User {user_id} is not registered for test {test_id}")
+
+    def set_scores(self, test_id, scores: dict):
+        """Save scores of a test, scores is {user_id: score}"""
+        with self.transaction():
+            self.conn.executemany(
+                "UPDATE registrations SET score = ? WHERE test_id = ? AND user_id = ?",
+                [(score, test_id, str(user_id)) for user_id, score in scores.items()]
+            )
+
+    def import_data(self, users: dict, tests: dict, registrations: dict):
+        """Insert whole collections (in the JSON layout) in one transaction"""
+        with self.transaction():
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO users (user_id, name, surname, username, registered_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                [(user_id, *(data.get(c) for c in self.USER_COLUMNS))
+                 for user_id, data in users.items()]
+            )
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO tests (test_id, answers, deadline, check_time, created_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                [(test_id, *(data.get(c) for c in self.TEST_COLUMNS))
+                 for test_id, data in tests.items()]
+            )
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO registrations "
+                "(test_id, user_id, registered_at, answers, score, submitted_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                [(test_id, user_id, *(data.get(c) for c in self.REGISTRATION_COLUMNS))
+                 for test_id, test_registrations in registrations.items()
+                 for user_id, data in test_registrations.items()]
+            )
+
+    def transaction(self):
+        """Context manager running statements in one transaction"""
+        return _Transaction(self.conn)
+
+    def commit(self):
+        """Every mutation is committed by its transaction"""
+
+    # Persistence
+    def flush(self):
+        """Every mutation is committed immediately, only checkpoint the WAL"""
+        try:
+            self.conn.execute("PRAGMA wal_checkpoint(PASSIVE)")
+        except sqlite3.Error as e:
+            logger.error(f"SQLite checkpoint error: {e}")
+
+    def close(self):
+        """Checkpoint and close the database"""
+        self.flush()
+        self.conn.close()
+
+
+class _Transaction:
+    """BEGIN/COMMIT wrapper for an autocommit connection (nested use joins the outer one)"""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.outer = False
+
+    def __enter__(self):
+        if not self.conn.in_transaction:
+            # Take the write lock up front, so processes wait for each other instead of deadlocking
+            try:
+                self.conn.execute("BEGIN IMMEDIATE")
+            except sqlite3.OperationalError as e:
+                if e.sqlite_errorcode == sqlite3.SQLITE_BUSY:
+                    raise StoreBusy(str(e)) from e
+                raise
+            self.outer = True
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        if not self.outer:
+            return False
+        if exc_type is None:
+            self.conn.execute("COMMIT")
+        else:
+            self.conn.execute("ROLLBACK")
+        return False
+
+
+def create_store(data_dir: str, backend: str = STORAGE_BACKEND):
+    """Create the store selected by STORAGE_BACKEND"""
+    if backend == 'sqlite':
+        logger.info("Using SQLite storage")
+        return SQLiteStore(os.path.join(data_dir, SQLITE_FILENAME))
+    if backend != 'json':
+        raise ValueError(f"Unknown STORAGE_BACKEND: {backend}")
+    return JsonStore(data_dir)
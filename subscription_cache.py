@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+In-process cache of channel subscription checks
+Keyed by user_id, with separate TTLs for subscribed / not subscribed
+results and LRU eviction once the size limit is reached.
+"""
+
+import os
+import time
+from collections import OrderedDict
+
+# Seconds a "subscribed" result is trusted
+POSITIVE_TTL = float(os.getenv('SUBSCRIPTION_CACHE_TTL', '300'))
+
+# Seconds a "not subscribed" result is trusted (short, so new subscribers get in quickly)
+NEGATIVE_TTL = float(os.getenv('SUBSCRIPTION_CACHE_NEGATIVE_TTL', '10'))
+
+# Maximum number of cached users
+MAX_SIZE = int(os.getenv('SUBSCRIPTION_CACHE_SIZE', '100000'))
+
+
+class SubscriptionCache:
+    """TTL + LRU cache of subscription check results"""
+
+    def __init__(self, positive_ttl: float = POSITIVE_TTL, negative_ttl: float = NEGATIVE_TTL,
+                 max_size: int = MAX_SIZE):
+        self.positive_ttl = positive_ttl
+        self.negative_ttl = negative_ttl
+        self.max_size = max_size
+        self._entries = OrderedDict()  # user_id -> (is_subscribed, expires_at)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, user_id):
+        """Return cached result (True/False) or None if unknown or expired"""
+        entry = self._entries.get(user_id)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        is_subscribed, expires_at = entry
+        if expires_at <= time.monotonic():
+            del self._entries[user_id]
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(user_id)
+        self.hits += 1
+        return is_subscribed
+
+    def set(self, user_id, is_subscribed: bool):
+        """Store a subscription check result"""
+        ttl = self.positive_ttl if is_subscribed else self.negative_ttl
+        if ttl <= 0:
+            return
+        self._entries[user_id] = (is_subscribed, time.monotonic() + ttl)
+        self._entries.move_to_end(user_id)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, user_id):
+        """Forget the cached result of a user"""
+        self._entries.pop(user_id, None)
+
+    def stats(self) -> dict:
+        """Return hit/miss counters"""
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'size': len(self._entries),
+            'evictions': self.evictions,
+        }
@@ -6,8 +6,11 @@ Admin Channel: @IshtixonKimyo
 Mandatory Subscription Channel: @untoldies
 """
 
+import asyncio
+import importlib
 import logging
-from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup, ReplyKeyboardMarkup, KeyboardButton
+import sys
+from telegram import Bot, Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import (
     Application,
     CommandHandler,
@@ -19,16 +22,26 @@ from telegram.ext import (
 )
 from telegram.request import HTTPXRequest
 from telegram.error import TelegramError
-import json
 import os
 from datetime import datetime
-import pandas as pd
-import numpy as np
-import matplotlib
-matplotlib.use('Agg')  # Use non-GUI backend for server
-import matplotlib.pyplot as plt
-import seaborn as sns
-import io
+from functools import partial
+import storage
+from storage import create_store
+from writer import PersistenceWriter
+from subscription_cache import SubscriptionCache
+from broadcast import Broadcaster
+from media_cache import FileIdCache, chart_version
+from analytics_pool import AnalyticsPool, AnalyticsUnavailable
+from analysis_cache import AnalysisCache, analysis_key
+from catalog import TestCatalog
+from reports import ReportPages, NOOP_CALLBACK, fit_message, page_callback, parse_page_callback
+from check_schedule import CheckSchedule
+from export import export_test
+from bulk_import import MAX_FILE_SIZE, BulkImportError, parse_tests
+from notifications import NewUserDigest
+from state_persistence import StatePersistence
+import metrics
+import sharding
 
 # Enable logging
 logging.basicConfig(
@@ -52,41 +65,96 @@ ADMIN_IDS = [int(id.strip()) for id in ADMIN_IDS_ENV.split(',')]
 WAITING_NAME, WAITING_SURNAME, WAITING_TEST_ANSWERS, WAITING_USER_ANSWERS = range(4)
 ADMIN_WAITING_TEST_NUMBER, ADMIN_WAITING_ANSWERS, ADMIN_WAITING_DEADLINE, ADMIN_WAITING_CHECK_TIME = range(4, 8)
 
-# Data file paths
+# Data directory
 DATA_DIR = "bot_data"
-USERS_FILE = os.path.join(DATA_DIR, "users.json")
-TESTS_FILE = os.path.join(DATA_DIR, "tests.json")
-REGISTRATIONS_FILE = os.path.join(DATA_DIR, "registrations.json")
 
-# Create data directory if it doesn't exist
-os.makedirs(DATA_DIR, exist_ok=True)
+# Number of updates processed in parallel
+CONCURRENT_UPDATES = int(os.getenv('CONCURRENT_UPDATES', '256'))
 
+# Webhook mode: set WEBHOOK_URL (public https base URL) to receive updates
+# through PTB's webhook server instead of long polling
+WEBHOOK_URL = os.getenv('WEBHOOK_URL', '')
+WEBHOOK_LISTEN = os.getenv('WEBHOOK_LISTEN', '0.0.0.0')
+WEBHOOK_PORT = int(os.getenv('WEBHOOK_PORT', os.getenv('PORT', '8443')))
+WEBHOOK_PATH = os.getenv('WEBHOOK_PATH', 'telegram')
+WEBHOOK_SECRET_TOKEN = os.getenv('WEBHOOK_SECRET_TOKEN') or None
+WEBHOOK_MAX_CONNECTIONS = int(os.getenv('WEBHOOK_MAX_CONNECTIONS', '40'))
 
-# Data management functions
-def load_data(filename):
-    """Load data from JSON file"""
-    if os.path.exists(filename):
-        try:
-            with open(filename, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except:
-            return {}
-    return {}
+# Bot API server (a local telegram-bot-api server can be used instead)
+BOT_API_URL = os.getenv('BOT_API_URL', 'https://api.telegram.org').rstrip('/')
+
+# Update types the handlers use (Telegram does not send the others)
+ALLOWED_UPDATES = [Update.MESSAGE, Update.CALLBACK_QUERY]
+
+# Import NumPy grading and start analytics workers in the background after
+# startup (otherwise both are loaded when an admin first needs them)
+ANALYTICS_PREWARM = os.getenv('ANALYTICS_PREWARM', '0') == '1'
+ANALYTICS_PREWARM_DELAY = float(os.getenv('ANALYTICS_PREWARM_DELAY', '5'))
+
+# Process-wide data store (backend selected by STORAGE_BACKEND)
+store = create_store(DATA_DIR)
+
+# All mutations go through the single writer task
+writer = PersistenceWriter(store)
+
+# Parsed tests and cached main menu
+catalog = TestCatalog(store.get_tests())
+
+# Recent get_chat_member results
+subscription_cache = SubscriptionCache()
+
+# Rate-limited sender for per-user results
+broadcaster = Broadcaster(os.path.join(DATA_DIR, "broadcasts"))
 
+# file_ids of uploaded Rasch charts
+chart_file_ids = FileIdCache(os.path.join(DATA_DIR, "chart_file_ids.json"))
+
+# Worker processes for Rasch analysis and charts
+analytics_pool = AnalyticsPool()
+
+# Rasch results keyed by a hash of the answer key and submissions
+analysis_cache = AnalysisCache(os.path.join(DATA_DIR, "analysis_cache"))
+
+
+# check_time jobs and the record of finished checks
+check_schedule = CheckSchedule(os.path.join(DATA_DIR, "checked_tests.json"))
+
+# New-user notifications, posted to the admin channel as digests
+new_user_digest = NewUserDigest(os.path.join(DATA_DIR, "notified_users.journal"))
+
+# Conversation states and user_data kept across restarts (one file per worker process)
+STATE_FILE = os.path.join(
+    DATA_DIR, "conversations" if sharding.SHARD_INDEX is None else f"conversations_{sharding.SHARD_INDEX}"
+)
 
-def save_data(filename, data):
-    """Save data to JSON file"""
-    with open(filename, 'w', encoding='utf-8') as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+# Row indexes of paged admin reports
+reports = ReportPages()
+REGISTRATIONS_REPORT = "regs"
+
+# Background pre-warm task (see ANALYTICS_PREWARM)
+prewarm_task = None
+
+# Prometheus endpoint (see METRICS_PORT)
+metrics_server = None
+
+# Catalog refresh on the workers that do not handle admins (see SHARD_WORKERS)
+catalog_sync_task = None
 
 
 # Check channel subscription
 async def check_subscription(update: Update, context: ContextTypes.DEFAULT_TYPE) -> bool:
     """Check if user is subscribed to the mandatory channel"""
     user_id = update.effective_user.id
+    
+    cached = subscription_cache.get(user_id)
+    if cached is not None:
+        return cached
+    
     try:
         member = await context.bot.get_chat_member(chat_id=MANDATORY_CHANNEL, user_id=user_id)
-        return member.status in ['member', 'administrator', 'creator']
+        is_subscribed = member.status in ['member', 'administrator', 'creator']
+        subscription_cache.set(user_id, is_subscribed)
+        return is_subscribed
     except TelegramError as e:
         logger.error(f"Error checking subscription: {e}")
         # Return False to require subscription (user must subscribe to continue)
@@ -95,26 +163,14 @@ async def check_subscription(update: Update, context: ContextTypes.DEFAULT_TYPE)
 
 # Notify admin about new user
 async def notify_admin(update: Update, context: ContextTypes.DEFAULT_TYPE, source_channel=None):
-    """Send notification to admin channel about new user"""
+    """Queue a new user for the next admin channel digest (each user is announced once)"""
     user = update.effective_user
     
-    message = f"""
-🆕 Yangi foydalanuvchi!
-
-👤 Foydalanuvchi: {user.full_name}
-🆔 User ID: {user.id}
-📝 Username: @{user.username if user.username else 'Mavjud emas'}
-"""
-    
-    if source_channel:
-        message += f"📢 Kanal: {source_channel}\n"
-    
-    message += f"🕐 Sana: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
+    # Users registered before the digest existed are not new
+    if store.has_user(user.id):
+        return
     
-    try:
-        await context.bot.send_message(chat_id=ADMIN_CHANNEL, text=message)
-    except TelegramError as e:
-        logger.error(f"Admin notification error: {e}")
+    new_user_digest.add(user.id, user.full_name, user.username, source_channel)
 
 
 # Start command
@@ -141,9 +197,7 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     await notify_admin(update, context)
     
     # Check if user already registered
-    users = load_data(USERS_FILE)
-    
-    if str(user_id) in users:
+    if store.has_user(user_id):
         # User already registered, show main menu
         await show_main_menu(update, context)
         return ConversationHandler.END
@@ -162,6 +216,8 @@ async def check_subscription_callback(update: Update, context: ContextTypes.DEFA
     query = update.callback_query
     await query.answer()
     
+    # User says they just subscribed - always ask Telegram again
+    subscription_cache.invalidate(update.effective_user.id)
     is_subscribed = await check_subscription(update, context)
     
     if not is_subscribed:
@@ -185,9 +241,8 @@ async def check_subscription_callback(update: Update, context: ContextTypes.DEFA
     
     # Check if user already registered
     user_id = update.effective_user.id
-    users = load_data(USERS_FILE)
     
-    if str(user_id) in users:
+    if store.has_user(user_id):
         # User already registered
         await query.edit_message_text("✅ Siz allaqachon ro'yxatdan o'tgansiz!")
         await show_main_menu(update, context)
@@ -215,14 +270,12 @@ async def get_surname(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int
     user_id = update.effective_user.id
     
     # Save user data
-    users = load_data(USERS_FILE)
-    users[str(user_id)] = {
+    await writer.add_user(user_id, {
         'name': context.user_data['name'],
         'surname': surname,
         'username': update.effective_user.username,
         'registered_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-    }
-    save_data(USERS_FILE, users)
+    })
     
     await update.message.reply_text(
         f"✅ Ro'yxatdan muvaffaqiyatli o'tdingiz!\n\n"
@@ -237,54 +290,10 @@ async def get_surname(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int
 # Show main menu
 async def show_main_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Show main menu with available tests"""
-    tests = load_data(TESTS_FILE)
-    
-    if not tests:
-        keyboard = [[KeyboardButton("🔄 Yangilash")]]
-        reply_markup = ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
-        
-        message = update.message if update.message else update.callback_query.message
-        await message.reply_text(
-            "📋 Hozirda mavjud testlar yo'q.",
-            reply_markup=reply_markup
-        )
-        return
-    
-    # Show available tests
-    keyboard = []
-    now = datetime.now()
-    available_count = 0
-    
-    for test_id, test_data in tests.items():
-        deadline = datetime.strptime(test_data['deadline'], '%Y-%m-%d %H:%M:%S')
-        if now < deadline:
-            # Count questions in the test
-            answers = test_data['answers'].replace(' ', '').lower()
-            question_count = len([c for c in answers if c.isalpha()])
-            
-            keyboard.append([KeyboardButton(f"📝 Test #{test_id} ({question_count} ta savol)")])
-            available_count += 1
-    
-    if available_count == 0:
-        keyboard = [[KeyboardButton("🔄 Yangilash")]]
-        reply_markup = ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
-        
-        message = update.message if update.message else update.callback_query.message
-        await message.reply_text(
-            "📋 Hozirda mavjud testlar yo'q (barcha testlar deadline o'tgan).",
-            reply_markup=reply_markup
-        )
-        return
-    
-    keyboard.append([KeyboardButton("🔄 Yangilash")])
-    reply_markup = ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
+    text, reply_markup = catalog.menu()
     
     message = update.message if update.message else update.callback_query.message
-    await message.reply_text(
-        f"📋 Mavjud testlar: {available_count} ta\n\n"
-        "Test tanlash uchun tugmani bosing:",
-        reply_markup=reply_markup
-    )
+    await message.reply_text(text, reply_markup=reply_markup)
 
 
 # Handle test selection
@@ -306,15 +315,12 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if text.startswith("📝 Test #"):
         # Extract test_id from "📝 Test #123 (10 ta savol)" format
         test_id = text.split("(")[0].replace("📝 Test #", "").strip()
-        tests = load_data(TESTS_FILE)
+        test_data = store.get_test(test_id)
         
-        if test_id in tests:
-            test_data = tests[test_id]
+        if test_data is not None:
             context.user_data['selected_test'] = test_id
             
-            # Count questions
-            correct_answers = test_data['answers'].replace(' ', '').lower()
-            question_count = len([c for c in correct_answers if c.isalpha()])
+            question_count = catalog.question_count(test_id)
             
             await update.message.reply_text(
                 f"✅ Siz Test #{test_id} uchun ro'yxatdan o'tdingiz!\n\n"
@@ -324,19 +330,12 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
                 f"📝 Javoblaringizni yuboring (Format: 1a2b3c yoki abc):"
             )
             
-            # Save registration
-            registrations = load_data(REGISTRATIONS_FILE)
-            if test_id not in registrations:
-                registrations[test_id] = {}
-            
-            registrations[test_id][str(user_id)] = {
-                'name': load_data(USERS_FILE)[str(user_id)]['name'],
-                'surname': load_data(USERS_FILE)[str(user_id)]['surname'],
+            # Save registration (the name stays in the user record)
+            await writer.register(test_id, user_id, {
                 'registered_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
                 'answers': None,
                 'score': None
-            }
-            save_data(REGISTRATIONS_FILE, registrations)
+            })
             
             return WAITING_USER_ANSWERS
     
@@ -346,15 +345,14 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
         user_answers = text.strip().replace(' ', '').lower()
         
         # Get test data to validate
-        tests = load_data(TESTS_FILE)
-        if test_id not in tests:
+        test_data = store.get_test(test_id)
+        if test_data is None:
             await update.message.reply_text("❌ Test topilmadi. Qaytadan urinib ko'ring.")
             del context.user_data['selected_test']
             await show_main_menu(update, context)
             return
         
-        correct_answers = tests[test_id]['answers'].replace(' ', '').lower()
-        correct_count = len([c for c in correct_answers if c.isalpha()])
+        correct_count = catalog.question_count(test_id)
         user_count = len([c for c in user_answers if c.isalpha()])
         
         # Validate answer count
@@ -378,10 +376,7 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
             return
         
         # Save user's answers
-        registrations = load_data(REGISTRATIONS_FILE)
-        registrations[test_id][str(user_id)]['answers'] = user_answers
-        registrations[test_id][str(user_id)]['submitted_at'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        save_data(REGISTRATIONS_FILE, registrations)
+        await writer.submit_answers(test_id, user_id, user_answers, datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
         
         await update.message.reply_text(
             f"✅ Javoblaringiz qabul qilindi!\n\n"
@@ -413,11 +408,118 @@ async def admin_panel(update: Update, context: ContextTypes.DEFAULT_TYPE):
     
     await update.message.reply_text(
         "🔧 Admin Panel\n\n"
+        "📥 Ko'p testni birdaniga qo'shish: test_id, answers, deadline, check_time "
+        "ustunli CSV yoki JSON faylni yuboring.\n"
+        "📄 Eksport: /export <test raqami>\n\n"
         "Tanlang:",
         reply_markup=reply_markup
     )
 
 
+# Admin subscription cache statistics
+async def admin_cache_stats(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Show subscription cache counters"""
+    if update.effective_user.id not in ADMIN_IDS:
+        await update.message.reply_text("❌ Sizda bu buyruqni ishlatish huquqi yo'q.")
+        return
+    
+    stats = subscription_cache.stats()
+    await update.message.reply_text(
+        f"🗂 Obuna keshi\n\n"
+        f"✅ Hit: {stats['hits']}\n"
+        f"❌ Miss: {stats['misses']}\n"
+        f"🎯 Hit rate: {stats['hit_rate'] * 100:.1f}%\n"
+        f"👥 Hajm: {stats['size']} / {subscription_cache.max_size}\n"
+        f"🗑 Chiqarilgan: {stats['evictions']}"
+    )
+
+
+# Admin export
+async def admin_export(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Send a test's registrations, answers, scores and Rasch results as CSV"""
+    if update.effective_user.id not in ADMIN_IDS:
+        await update.message.reply_text("❌ Sizda bu buyruqni ishlatish huquqi yo'q.")
+        return
+    
+    if not context.args:
+        await update.message.reply_text("ℹ️ Foydalanish: /export <test raqami>")
+        return
+    
+    test_id = context.args[0]
+    test_data = store.get_test(test_id)
+    if test_data is None:
+        await update.message.reply_text("❌ Test topilmadi.")
+        return
+    
+    # Rasch columns only come from an analysis of the current submissions
+    cached = analysis_cache.get(test_id, analysis_key(test_data['answers'], analysis_snapshot(test_id)))
+    result_df = cached[0] if cached is not None else None
+    
+    path, rows = await export_test(store, test_id, result_df)
+    try:
+        with open(path, 'rb') as f:
+            await update.message.reply_document(
+                document=f,
+                filename=f"test_{test_id}.csv",
+                caption=f"📄 Test #{test_id}: {rows} ta qator"
+                        + ("" if result_df is not None else
+                           "\n⚠️ Rasch ustunlari bo'sh: joriy javoblar bo'yicha Rasch analysis hali bajarilmagan")
+            )
+    finally:
+        os.remove(path)
+
+
+# Admin bulk test import
+async def admin_import_tests(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Add many tests from an uploaded CSV / JSON file in one transaction"""
+    if update.effective_user.id not in ADMIN_IDS:
+        return
+    
+    document = update.message.document
+    if document.file_size and document.file_size > MAX_FILE_SIZE:
+        await update.message.reply_text(f"❌ Fayl juda katta (maksimum {MAX_FILE_SIZE // 1024} KB).")
+        return
+    
+    file = await document.get_file()
+    data = bytes(await file.download_as_bytearray())
+    try:
+        tests, errors = parse_tests(document.file_name or '', data)
+    except BulkImportError as e:
+        await update.message.reply_text(f"❌ Faylni o'qib bo'lmadi: {e}")
+        return
+    
+    if errors:
+        lines = [f"❌ Import bekor qilindi: {len(errors)} ta qatorda xato (hech narsa saqlanmadi)\n"]
+        lines += [f"Qator {row}{f' (#{test_id})' if test_id else ''}: {error}" for row, test_id, error in errors]
+        await update.message.reply_text(fit_message("\n".join(lines)))
+        return
+    
+    if not tests:
+        await update.message.reply_text("❌ Faylda testlar yo'q.")
+        return
+    
+    created_at = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    for test_data in tests.values():
+        test_data['created_at'] = created_at
+    replaced = sum(1 for test_id in tests if store.get_test(test_id) is not None)
+    
+    await writer.add_tests(tests)
+    for test_id, test_data in tests.items():
+        catalog.add(test_id, test_data)
+        if context.job_queue is not None:
+            check_schedule.add(context.job_queue, test_id, test_data, scheduled_check)
+    
+    await update.message.reply_text(fit_message(
+        f"✅ {len(tests)} ta test import qilindi"
+        + (f" ({replaced} tasi yangilandi)" if replaced else "") + ":\n\n"
+        + "\n".join(
+            f"📝 Test #{test_id}: {catalog.question_count(test_id)} ta savol, "
+            f"deadline {test_data['deadline']}, tekshirish {test_data['check_time']}"
+            for test_id, test_data in tests.items()
+        )
+    ))
+
+
 # Admin add test
 async def admin_add_test_start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Start adding a new test"""
@@ -471,22 +573,23 @@ async def admin_get_check_time(update: Update, context: ContextTypes.DEFAULT_TYP
         check_time = datetime.strptime(update.message.text, '%Y-%m-%d %H:%M:%S')
         
         # Save test
-        tests = load_data(TESTS_FILE)
         test_id = context.user_data['admin_test_number']
-        
-        tests[test_id] = {
+        test_data = {
             'answers': context.user_data['admin_test_answers'],
             'deadline': context.user_data['admin_test_deadline'],
             'check_time': update.message.text,
             'created_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
         }
-        save_data(TESTS_FILE, tests)
+        await writer.add_test(test_id, test_data)
+        catalog.add(test_id, test_data)
+        if context.job_queue is not None:
+            check_schedule.add(context.job_queue, test_id, test_data, scheduled_check)
         
         await update.message.reply_text(
             f"✅ Test #{test_id} muvaffaqiyatli qo'shildi!\n\n"
-            f"Javoblar: {tests[test_id]['answers']}\n"
-            f"Deadline: {tests[test_id]['deadline']}\n"
-            f"Tekshirish vaqti: {tests[test_id]['check_time']}"
+            f"Javoblar: {test_data['answers']}\n"
+            f"Deadline: {test_data['deadline']}\n"
+            f"Tekshirish vaqti: {test_data['check_time']}"
         )
         
         # Clear user data
@@ -501,18 +604,36 @@ async def admin_get_check_time(update: Update, context: ContextTypes.DEFAULT_TYP
         return ADMIN_WAITING_CHECK_TIME
 
 
+# Broadcast progress message
+def broadcast_progress(query):
+    """Return a callback that shows broadcast progress in the admin's message"""
+    async def report(stats: dict):
+        done = stats['sent'] + stats['failed'] + stats['skipped']
+        try:
+            await query.edit_message_text(
+                f"📤 Natijalar yuborilmoqda...\n\n"
+                f"📊 {done}/{stats['total']}\n"
+                f"✅ Yuborildi: {stats['sent'] + stats['skipped']}\n"
+                f"❌ Xatolik: {stats['failed']}"
+            )
+        except TelegramError:
+            # Message not modified or edit rate limited - skip this update
+            pass
+    return report
+
+
 # Admin check answers
 async def admin_check_answers(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Check and grade all submitted answers"""
     query = update.callback_query
     await query.answer()
     
-    tests = load_data(TESTS_FILE)
-    registrations = load_data(REGISTRATIONS_FILE)
+    tests = store.get_tests()
+    registered = store.registration_counts()
     
     keyboard = []
     for test_id in tests.keys():
-        if test_id in registrations:
+        if test_id in registered:
             keyboard.append([InlineKeyboardButton(f"Test #{test_id}", callback_data=f"check_{test_id}")])
     
     if not keyboard:
@@ -533,81 +654,108 @@ async def admin_check_specific_test(update: Update, context: ContextTypes.DEFAUL
     
     test_id = query.data.replace("check_", "")
     
-    tests = load_data(TESTS_FILE)
-    registrations = load_data(REGISTRATIONS_FILE)
-    
-    if test_id not in tests or test_id not in registrations:
+    if store.get_test(test_id) is None:
         await query.edit_message_text("❌ Test topilmadi.")
         return
     
-    correct_answers = tests[test_id]['answers'].lower().replace(" ", "")
-    # Extract only letters (answer options: a, b, c, d, e)
-    correct_letters = [c for c in correct_answers if c.isalpha()]
-    total_questions = len(correct_letters)
+    stats = await grade_and_deliver(context.bot, test_id, progress=broadcast_progress(query))
+    if stats is None:
+        await query.edit_message_text(f"❌ Test #{test_id} uchun javoblar yo'q.")
+        return
+    check_schedule.finish(context.job_queue, test_id)
     
-    results = []
+    report_id = f"check_{test_id}"
+    text, reply_markup = reports.render(report_id, 0, report_renderer(report_id))
+    await query.edit_message_text(text, reply_markup=reply_markup)
+
+
+async def grade_and_deliver(bot, test_id, progress=None):
+    """
+    Grade a test, save the scores, send every participant their result and
+    build the results report. Returns broadcast stats, or None if nobody
+    registered for the test.
+    """
+    test_data = store.get_test(test_id)
+    test_registrations = list(store.get_registrations(test_id).items())
+    if test_data is None or not test_registrations:
+        return None
+    
+    # Grade every submission in one vectorized pass
+    grading = await load_grading()
+    graded = grading.grade_test(
+        test_data['answers'],
+        {user_id: user_data['answers'] for user_id, user_data in test_registrations}
+    )
+    total_questions = graded.num_questions
+    user_scores = dict(zip(graded.user_ids, graded.scores.tolist()))
     
-    for user_id, user_data in registrations[test_id].items():
+    scores = {}
+    deliveries = []
+    
+    for user_id, user_data in test_registrations:
         if user_data['answers']:
-            user_answers = user_data['answers'].lower().replace(" ", "")
-            # Extract only letters from user answers
-            user_letters = [c for c in user_answers if c.isalpha()]
-            
-            # Calculate score by comparing letter by letter
-            score = 0
-            for i in range(min(len(user_letters), len(correct_letters))):
-                if user_letters[i] == correct_letters[i]:
-                    score += 1
+            score = user_scores[user_id]
             
             # Update score in registrations
-            registrations[test_id][user_id]['score'] = f"{score}/{total_questions}"
+            scores[user_id] = f"{score}/{total_questions}"
             
-            # Send result to user
-            try:
-                result_message = (
-                    f"📊 Test #{test_id} natijalari:\n\n"
-                    f"👤 {user_data['name']} {user_data['surname']}\n"
-                    f"✅ To'g'ri javoblar: {tests[test_id]['answers']}\n"
-                    f"📝 Sizning javobingiz: {user_data['answers']}\n"
-                    f"🎯 Ball: {score}/{total_questions}\n"
-                    f"📊 Foiz: {round(score/total_questions*100, 1)}%"
-                )
-                await context.bot.send_message(chat_id=int(user_id), text=result_message)
-            except Exception as e:
-                logger.error(f"Error sending result to user {user_id}: {e}")
-            
-            results.append(
-                f"👤 {user_data['name']} {user_data['surname']}\n"
-                f"   Javob: {user_data['answers']}\n"
-                f"   Ball: {score}/{total_questions} ({round(score/total_questions*100, 1)}%)\n"
-            )
-        else:
-            results.append(
-                f"👤 {user_data['name']} {user_data['surname']}\n"
-                f"   ⚠️ Javob yuborilmagan\n"
+            # Queue result for the user
+            result_message = (
+                f"📊 Test #{test_id} natijalari:\n\n"
+                f"👤 {store.full_name(user_id)}\n"
+                f"✅ To'g'ri javoblar: {test_data['answers']}\n"
+                f"📝 Sizning javobingiz: {user_data['answers']}\n"
+                f"🎯 Ball: {score}/{total_questions}\n"
+                f"📊 Foiz: {round(score/total_questions*100, 1)}%"
             )
+            deliveries.append((int(user_id), [
+                partial(bot.send_message, chat_id=int(user_id), text=result_message)
+            ]))
     
-    save_data(REGISTRATIONS_FILE, registrations)
+    await writer.set_scores(test_id, scores)
     
-    if not results:
-        await query.edit_message_text(f"❌ Test #{test_id} uchun javoblar yo'q.")
-        return
+    # Send results to all participants
+    stats = await broadcaster.send(f"check_{test_id}", deliveries, progress=progress)
     
-    # Sort results by score (highest first)
-    sorted_results = sorted(
-        [(r, int(r.split("Ball: ")[1].split("/")[0]) if "Ball:" in r else -1) for r in results],
-        key=lambda x: x[1],
+    # Ranking by score (highest first), rendered one page at a time
+    ranking = sorted(
+        (user_id for user_id, _ in test_registrations),
+        key=lambda user_id: user_scores.get(user_id, -1),
         reverse=True
     )
+    reports.put(f"check_{test_id}", check_report_header(test_id, test_data, len(ranking), stats), ranking)
+    return stats
+
+
+# Scheduled check at a test's check_time
+async def scheduled_check(context: ContextTypes.DEFAULT_TYPE):
+    """Grade a test and deliver results, then report to the admin channel"""
+    test_id = context.job.data
+    if store.get_test(test_id) is None:
+        return
     
-    result_text = f"📊 Test #{test_id} natijalari:\n\n"
-    result_text += f"✅ To'g'ri javoblar: {tests[test_id]['answers']}\n"
-    result_text += f"👥 Ishtirokchilar: {len(results)} ta\n\n"
-    result_text += "🏆 Natijalar (tartib bo'yicha):\n\n"
-    result_text += "\n".join([r[0] for r in sorted_results])
-    result_text += "\n\n✅ Barcha ishtirokchilarga natijalar yuborildi!"
+    logger.info(f"Scheduled check of test #{test_id}")
+    stats = await grade_and_deliver(context.bot, test_id)
+    check_schedule.finish(context.job_queue, test_id)
+    
+    if stats is None:
+        summary = f"⏰ Test #{test_id} tekshirish vaqti keldi, lekin ishtirokchilar yo'q."
+        reply_markup = None
+    else:
+        summary = (
+            f"⏰ Test #{test_id} avtomatik tekshirildi!\n\n"
+            f"👥 Ishtirokchilar: {len(store.get_registrations(test_id))} ta\n"
+            f"✅ Natijalar yuborildi: {stats['sent'] + stats['skipped']} ta\n"
+            f"❌ Yuborilmadi: {stats['failed']} ta"
+        )
+        reply_markup = InlineKeyboardMarkup([[InlineKeyboardButton(
+            "📊 Natijalar", callback_data=page_callback(f"check_{test_id}", 0)
+        )]])
     
-    await query.edit_message_text(result_text)
+    try:
+        await context.bot.send_message(chat_id=ADMIN_CHANNEL, text=summary, reply_markup=reply_markup)
+    except TelegramError as e:
+        logger.error(f"Error sending check summary of test #{test_id}: {e}")
 
 
 # Admin view registrations
@@ -616,21 +764,166 @@ async def admin_view_registrations(update: Update, context: ContextTypes.DEFAULT
     query = update.callback_query
     await query.answer()
     
-    registrations = load_data(REGISTRATIONS_FILE)
-    
-    if not registrations:
+    if not build_report(REGISTRATIONS_REPORT):
         await query.edit_message_text("❌ Hech qanday ro'yxat topilmadi.")
         return
     
-    result_text = "📋 Barcha ro'yxatlar:\n\n"
+    text, reply_markup = reports.render(REGISTRATIONS_REPORT, 0, report_renderer(REGISTRATIONS_REPORT))
+    await query.edit_message_text(text, reply_markup=reply_markup)
+
+
+# Paged admin reports
+def check_report_header(test_id, test_data: dict, participants: int, stats: dict = None) -> str:
+    """Header of a test's results report"""
+    header = (
+        f"📊 Test #{test_id} natijalari:\n\n"
+        f"✅ To'g'ri javoblar: {test_data['answers']}\n"
+        f"👥 Ishtirokchilar: {participants} ta\n"
+    )
+    if stats is not None:
+        header += f"✅ Natijalar yuborildi: {stats['sent'] + stats['skipped']} ta\n"
+        if stats['failed']:
+            header += f"❌ Yuborilmadi: {stats['failed']} ta\n"
+    return header + "\n🏆 Natijalar (tartib bo'yicha):"
+
+
+def stored_score(user_data: dict) -> int:
+    """Raw score saved by the last check ("7/10" -> 7), -1 if not checked"""
+    if not user_data.get('answers') or not user_data.get('score'):
+        return -1
+    return int(user_data['score'].split('/')[0])
+
+
+def analysis_snapshot(test_id) -> dict:
+    """Copy of a test's registrations with participant names, as sent to the analytics workers"""
+    snapshot = {}
+    for user_id, registration in store.get_registrations(test_id).items():
+        user = store.get_user(user_id) or {'name': f"ID {user_id}", 'surname': ""}
+        snapshot[user_id] = dict(registration, name=user['name'], surname=user['surname'])
+    return snapshot
+
+
+def put_rasch_report(test_id, result_df):
+    """Index of a Rasch report: (name, correct, score, certificate) rows sorted by score"""
+    ranking = result_df.sort_values('Rasch_Ball_90.5', ascending=False)
+    rows = list(zip(
+        ranking['Ishtirokchi'], ranking['Togri_Javoblar'], ranking['Rasch_Ball_90.5'], ranking['Sertifikat']
+    ))
+    header = (
+        f"📊 Test #{test_id} - Rasch Analysis Natijalari\n\n"
+        f"👥 Ishtirokchilar: {len(result_df)} ta\n\n"
+        "🏆 Natijalar:"
+    )
+    reports.put(f"rasch_{test_id}", header, rows)
+
+
+def build_report(report_id: str) -> bool:
+    """Build a report index from the store, False if there is nothing to show"""
+    kind, _, test_id = report_id.partition('_')
+    if kind == REGISTRATIONS_REPORT:
+        # Keys only: the records of a page are read when it is rendered
+        rows = [
+            (test_id, user_id, count)
+            for test_id, count in store.registration_counts().items()
+            for user_id in store.registration_user_ids(test_id)
+        ]
+        if not rows:
+            return False
+        reports.put(report_id, "📋 Barcha ro'yxatlar:", rows)
+        return True
+    
+    # Reports of a test, e.g. after a restart
+    test_data = store.get_test(test_id)
+    registrations = store.get_registrations(test_id)
+    if test_data is None or not registrations:
+        return False
     
-    for test_id, users in registrations.items():
-        result_text += f"📝 Test #{test_id} ({len(users)} ta foydalanuvchi):\n"
-        for user_id, user_data in users.items():
-            result_text += f"   • {user_data['name']} {user_data['surname']}\n"
-        result_text += "\n"
+    if kind == 'rasch':
+        cached = analysis_cache.get(test_id, analysis_key(test_data['answers'], analysis_snapshot(test_id)))
+        if cached is None:
+            return False
+        put_rasch_report(test_id, cached[0])
+        return True
     
-    await query.edit_message_text(result_text)
+    ranking = sorted(registrations, key=lambda user_id: stored_score(registrations[user_id]), reverse=True)
+    reports.put(report_id, check_report_header(test_id, test_data, len(ranking)), ranking)
+    return True
+
+
+def render_registration_rows(rows: list, first_number: int) -> str:
+    """Participants of one page of the registrations report, grouped by test"""
+    lines = []
+    current_test = None
+    for test_id, user_id, count in rows:
+        if test_id != current_test:
+            if current_test is not None:
+                lines.append("")
+            lines.append(f"📝 Test #{test_id} ({count} ta foydalanuvchi):")
+            current_test = test_id
+        if store.get_registration(test_id, user_id) is not None:
+            lines.append(f"   • {store.full_name(user_id)}")
+    return "\n".join(lines)
+
+
+def render_check_rows(test_id, rows: list, first_number: int) -> str:
+    """Results of one page of a test's results report"""
+    results = []
+    for number, user_id in enumerate(rows, first_number):
+        user_data = store.get_registration(test_id, user_id)
+        if user_data is None:
+            continue
+        if stored_score(user_data) >= 0:
+            score, total = (int(n) for n in user_data['score'].split('/'))
+            percent = round(score / total * 100, 1) if total else 0
+            results.append(
+                f"{number}. 👤 {store.full_name(user_id)}\n"
+                f"   Javob: {user_data['answers']}\n"
+                f"   Ball: {score}/{total} ({percent}%)\n"
+            )
+        else:
+            results.append(
+                f"{number}. 👤 {store.full_name(user_id)}\n"
+                f"   ⚠️ Javob yuborilmagan\n"
+            )
+    return "\n".join(results)
+
+
+def render_rasch_rows(rows: list, first_number: int) -> str:
+    """Results of one page of a Rasch report"""
+    return "\n".join(
+        f"{number}. {name}\n"
+        f"  ✓ To'g'ri: {correct} | "
+        f"Ball: {score:.2f} | "
+        f"{certificate}\n"
+        for number, (name, correct, score, certificate) in enumerate(rows, first_number)
+    )
+
+
+def report_renderer(report_id: str):
+    """Row renderer of a report"""
+    kind, _, test_id = report_id.partition('_')
+    if kind == REGISTRATIONS_REPORT:
+        return render_registration_rows
+    if kind == 'rasch':
+        return render_rasch_rows
+    return partial(render_check_rows, test_id)
+
+
+async def admin_report_page(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Show another page of a report (◀ ▶ buttons)"""
+    query = update.callback_query
+    await query.answer()
+    
+    if query.data == NOOP_CALLBACK:
+        return
+    
+    report_id, page = parse_page_callback(query.data)
+    if not reports.has(report_id) and not build_report(report_id):
+        await query.edit_message_text("❌ Hisobot topilmadi.")
+        return
+    
+    text, reply_markup = reports.render(report_id, page, report_renderer(report_id))
+    await query.edit_message_text(text, reply_markup=reply_markup)
 
 
 # Cancel handler
@@ -640,144 +933,22 @@ async def cancel(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     return ConversationHandler.END
 
 
-# Rasch Analysis Functions
-def perform_rasch_analysis(test_id: str, registrations: dict, tests: dict) -> tuple:
-    """
-    Perform Rasch analysis on test results
-    Returns: (result_df, items_info_df, graph_buffer)
-    """
-    try:
-        # Prepare data
-        data = []
-        user_ids = []
-        
-        correct_answers = tests[test_id]['answers'].lower().replace(" ", "")
-        correct_letters = [c for c in correct_answers if c.isalpha()]
-        num_questions = len(correct_letters)
-        
-        for user_id, user_data in registrations[test_id].items():
-            if user_data['answers']:
-                user_answers = user_data['answers'].lower().replace(" ", "")
-                user_letters = [c for c in user_answers if c.isalpha()]
-                
-                # Create binary response vector (1=correct, 0=wrong)
-                responses = []
-                for i in range(num_questions):
-                    if i < len(user_letters):
-                        responses.append(1 if user_letters[i] == correct_letters[i] else 0)
-                    else:
-                        responses.append(0)
-                
-                data.append(responses)
-                user_ids.append(f"{user_data['name']} {user_data['surname']}")
-        
-        if not data:
-            return None, None, None
-        
-        # Create DataFrame
-        df = pd.DataFrame(data, index=user_ids, 
-                         columns=[f"S{i+1}" for i in range(num_questions)])
-        
-        # Rasch difficulty calculation
-        p_values = df.mean().clip(lower=0.01, upper=0.99)
-        difficulty_logits = np.log((1 - p_values) / p_values)
-        
-        # Item weights (1.0 to 4.0)
-        min_l, max_l = difficulty_logits.min(), difficulty_logits.max()
-        if max_l == min_l:
-            item_weights = np.ones(len(difficulty_logits)) * 2.5
-        else:
-            item_weights = (difficulty_logits - min_l) / (max_l - min_l) * 3.0 + 1.0
-        
-        # Calculate scores
-        raw_weighted_scores = df.dot(item_weights)
-        max_possible_raw = item_weights.sum()
-        target_max = 90.5
-        p = 0.75
-        final_scores = ((raw_weighted_scores / max_possible_raw) ** p) * target_max
-        rounded_scores = final_scores.round(2)
-        
-        # Certificate levels
-        def get_certificate(score):
-            if score >= 70: return "A+"
-            elif 65 <= score < 70: return "A"
-            elif 60 <= score < 65: return "B+"
-            elif 55 <= score < 60: return "B"
-            elif 50 <= score < 55: return "C+"
-            elif 46 <= score < 50: return "C"
-            else: return "Sertifikat berilmaydi"
-        
-        # Results DataFrame
-        result_df = pd.DataFrame({
-            'Ishtirokchi': user_ids,
-            'Togri_Javoblar': df.sum(axis=1),
-            'Rasch_Ball_90.5': rounded_scores,
-            'Sertifikat': rounded_scores.apply(get_certificate)
-        })
-        
-        # Items info for graph
-        items_info = pd.DataFrame({
-            'Savol': df.columns,
-            'Savol_Bali': item_weights.values.round(2)
-        }).sort_values(by='Savol_Bali', ascending=True)
-        
-        # Create graph
-        plt.figure(figsize=(12, 6))
-        sns.set_style("white")
-        palette = sns.color_palette("Blues_d", len(items_info))
-        
-        ax = sns.barplot(x='Savol', y='Savol_Bali', data=items_info, palette=palette)
-        
-        plt.title(f'Test #{test_id} - Savollar Qiyinlik Darajasi (Rasch Analysis)', 
-                 fontsize=14, fontweight='bold', pad=15)
-        plt.xlabel('Savollar', fontsize=11, fontweight='bold')
-        plt.ylabel('Ball (1.0 - 4.0)', fontsize=11, fontweight='bold')
-        plt.xticks(rotation=45, ha='right')
-        plt.ylim(0, 4.5)
-        
-        # Add values on bars
-        for p in ax.patches:
-            ax.annotate(format(p.get_height(), '.2f'),
-                       (p.get_x() + p.get_width() / 2., p.get_height()),
-                       ha='center', va='center',
-                       xytext=(0, 8),
-                       textcoords='offset points',
-                       fontsize=9, fontweight='bold', color='black')
-        
-        sns.despine()
-        plt.tight_layout()
-        
-        # Save to buffer
-        buf = io.BytesIO()
-        plt.savefig(buf, format='png', dpi=150, bbox_inches='tight')
-        buf.seek(0)
-        plt.close()
-        
-        return result_df, items_info, buf
-        
-    except Exception as e:
-        logger.error(f"Rasch analysis error: {e}")
-        return None, None, None
-
-
 async def admin_rasch_analysis(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Show available tests for Rasch analysis"""
     query = update.callback_query
     await query.answer()
     
-    tests = load_data(TESTS_FILE)
-    registrations = load_data(REGISTRATIONS_FILE)
+    tests = store.get_tests()
+    # Number of submitted answers per test
+    submitted = store.registration_counts(submitted=True)
     
     keyboard = []
     for test_id in tests.keys():
-        if test_id in registrations and registrations[test_id]:
-            # Count how many submitted answers
-            submitted = sum(1 for u in registrations[test_id].values() if u.get('answers'))
-            if submitted > 0:
-                keyboard.append([InlineKeyboardButton(
-                    f"Test #{test_id} ({submitted} ta ishtirokchi)", 
-                    callback_data=f"rasch_{test_id}"
-                )])
+        if test_id in submitted:
+            keyboard.append([InlineKeyboardButton(
+                f"Test #{test_id} ({submitted[test_id]} ta ishtirokchi)", 
+                callback_data=f"rasch_{test_id}"
+            )])
     
     if not keyboard:
         await query.edit_message_text("❌ Rasch analysis uchun javoblar yo'q.")
@@ -797,93 +968,207 @@ async def admin_rasch_specific_test(update: Update, context: ContextTypes.DEFAUL
     
     test_id = query.data.replace("rasch_", "")
     
-    tests = load_data(TESTS_FILE)
-    registrations = load_data(REGISTRATIONS_FILE)
+    tests = store.get_tests()
+    test_registrations = analysis_snapshot(test_id)
     
-    if test_id not in tests or test_id not in registrations:
+    if test_id not in tests or not test_registrations:
         await query.edit_message_text("❌ Test topilmadi.")
         return
     
-    # Perform analysis
-    result_df, items_info, graph_buf = perform_rasch_analysis(test_id, registrations, tests)
+    cache_key = analysis_key(tests[test_id]['answers'], test_registrations)
+    cached = analysis_cache.get(test_id, cache_key)
     
-    if result_df is None:
-        await query.edit_message_text("❌ Rasch analysis amalga oshirilmadi. Javoblar yo'q.")
-        return
-    
-    # Send graph
-    await query.message.reply_photo(
-        photo=graph_buf,
+    if cached is not None:
+        result_df, items_info, graph_bytes = cached
+    else:
+        await query.edit_message_text(f"⏳ Test #{test_id} - Rasch analysis bajarilmoqda...")
+        
+        # Perform analysis in a worker process (only this test's data is sent)
+        try:
+            result_df, items_info, graph_buf = await analytics_pool.run(
+                'perform_rasch_analysis',
+                test_id,
+                {test_id: test_registrations},
+                {test_id: tests[test_id]}
+            )
+        except asyncio.TimeoutError:
+            await query.edit_message_text(
+                f"❌ Rasch analysis {analytics_pool.timeout:.0f} soniyada tugamadi. Keyinroq qayta urinib ko'ring."
+            )
+            return
+        except AnalyticsUnavailable as e:
+            logger.error(f"Rasch analysis of test #{test_id} failed: {e}")
+            await query.edit_message_text(
+                "❌ Rasch analysis to'xtab qoldi (tahlil jarayoni qayta ishga tushirildi). Qaytadan urinib ko'ring."
+            )
+            return
+        
+        if result_df is None:
+            await query.edit_message_text("❌ Rasch analysis amalga oshirilmadi. Javoblar yo'q.")
+            return
+        
+        graph_bytes = graph_buf.getvalue()
+        analysis_cache.put(test_id, cache_key, (result_df, items_info, graph_bytes))
+    
+    # Send graph (uploaded only once, then reused by file_id)
+    graph_version = chart_version(graph_bytes)
+    graph_file_id = chart_file_ids.get(test_id, graph_version)
+    graph_message = await query.message.reply_photo(
+        photo=graph_file_id or graph_bytes,
         caption=f"📈 Test #{test_id} - Savollar qiyinlik darajasi (Rasch Analysis)"
     )
+    if graph_file_id is None:
+        graph_file_id = graph_message.photo[-1].file_id
+        chart_file_ids.set(test_id, graph_version, graph_file_id)
     
-    # Send results as formatted message
-    result_text = f"📊 Test #{test_id} - Rasch Analysis Natijalari\n\n"
-    result_text += f"👥 Ishtirokchilar: {len(result_df)} ta\n\n"
-    result_text += "🏆 Natijalar:\n\n"
-    
-    # Sort by score
-    result_df_sorted = result_df.sort_values('Rasch_Ball_90.5', ascending=False)
-    
-    for idx, row in result_df_sorted.iterrows():
-        result_text += f"{row['Ishtirokchi']}\n"
-        result_text += f"  ✓ To'g'ri: {row['Togri_Javoblar']} | "
-        result_text += f"Ball: {row['Rasch_Ball_90.5']:.2f} | "
-        result_text += f"{row['Sertifikat']}\n\n"
-    
-    # Send results to chat
-    await query.message.reply_text(result_text)
+    # Send results as a paged report
+    put_rasch_report(test_id, result_df)
+    text, reply_markup = reports.render(f"rasch_{test_id}", 0, report_renderer(f"rasch_{test_id}"))
+    await query.message.reply_text(text, reply_markup=reply_markup)
     
     # Send individual results to participants
-    for user_id, user_data in registrations[test_id].items():
+    deliveries = []
+    for user_id, user_data in test_registrations.items():
         if user_data.get('answers'):
             try:
-                # Find user's result
+                # Find user's result (result_df is indexed by user_id)
                 user_name = f"{user_data['name']} {user_data['surname']}"
-                user_result = result_df[result_df['Ishtirokchi'] == user_name].iloc[0]
+                user_result = result_df.loc[user_id]
                 
                 personal_message = (
                     f"📊 Test #{test_id} - Rasch Analysis Natijasi\n\n"
                     f"👤 {user_name}\n"
                     f"✅ To'g'ri javoblar: {int(user_result['Togri_Javoblar'])}\n"
                     f"🎯 Rasch Ball: {user_result['Rasch_Ball_90.5']:.2f} / 90.5\n"
-                    f"🏆 Sertifikat: {user_result['Sertifikat']}\n\n"
+                    f"🏆 Sertifikat: {user_result['Sertifikat']}\n"
+                    f"📐 Qobiliyat: {user_result['Qobiliyat_logit']:.2f} ± {user_result['Qobiliyat_SE']:.2f} logit\n\n"
                     f"📈 Rasch Analysis - professional baholash usuli orqali "
                     f"savollar qiyin ligi hisobga olingan holda ball hisobla ndi."
                 )
                 
-                await context.bot.send_message(chat_id=int(user_id), text=personal_message)
-                
-                # Send graph to user as well
-                graph_buf.seek(0)
-                await context.bot.send_photo(
-                    chat_id=int(user_id),
-                    photo=graph_buf,
-                    caption="📈 Test savollarining qiyinlik darajasi"
-                )
+                deliveries.append((int(user_id), [
+                    partial(context.bot.send_message, chat_id=int(user_id), text=personal_message),
+                    # Send graph to user as well
+                    partial(context.bot.send_photo, chat_id=int(user_id), photo=graph_file_id,
+                            caption="📈 Test savollarining qiyinlik darajasi"),
+                ]))
                 
             except Exception as e:
-                logger.error(f"Error sending Rasch result to user {user_id}: {e}")
+                logger.error(f"Error preparing Rasch result for user {user_id}: {e}")
+    
+    stats = await broadcaster.send(f"rasch_{test_id}", deliveries, progress=broadcast_progress(query))
     
     await query.edit_message_text(
         f"✅ Rasch Analysis yakunlandi!\n\n"
-        f"📊 {len(result_df)} ta ishtirokchiga shaxsiy natijalar yuborildi.\n"
+        f"📊 {stats['sent'] + stats['skipped']} ta ishtirokchiga shaxsiy natijalar yuborildi.\n"
+        f"❌ Yuborilmadi: {stats['failed']} ta\n"
         f"📈 Grafik va batafsil natijalar yuqorida ko'rsatilgan."
     )
 
 
+# Lazy loading of the analytics stack
+async def load_grading():
+    """Return the grading module, importing NumPy in a thread on first use"""
+    grading = sys.modules.get('grading')
+    if grading is None:
+        grading = await asyncio.to_thread(importlib.import_module, 'grading')
+    return grading
+
+
+async def prewarm_analytics():
+    """Load grading and start the analytics workers once polling is running"""
+    await asyncio.sleep(ANALYTICS_PREWARM_DELAY)
+    await load_grading()
+    analytics_pool.start()
+    logger.info("Analytics stack pre-warmed")
+
+
+# Tests added on the primary worker, picked up by the other workers
+async def sync_catalog():
+    """Add tests created by another worker process to this worker's menu"""
+    known = dict(store.get_tests())
+    while True:
+        await asyncio.sleep(sharding.SHARD_SYNC_INTERVAL)
+        for test_id, test_data in store.get_tests().items():
+            if known.get(test_id) != test_data:
+                catalog.add(test_id, test_data)
+                known[test_id] = test_data
+
+
+# Start background tasks
+async def post_init(application: Application):
+    """Start background tasks once the event loop is running"""
+    global prewarm_task, metrics_server, catalog_sync_task
+    await writer.start()
+    await new_user_digest.start(partial(application.bot.send_message, chat_id=ADMIN_CHANNEL))
+    if not sharding.is_primary():
+        # Checks run on the primary worker, tests are added there by admins
+        catalog_sync_task = asyncio.create_task(sync_catalog())
+    elif application.job_queue is None:
+        logger.warning("JobQueue is not available (install python-telegram-bot[job-queue]), "
+                       "tests are only checked by admins")
+    else:
+        scheduled = check_schedule.restore(
+            application.job_queue, store.get_tests(), scheduled_check,
+            checked=lambda test_id: any(r.get('score') for r in store.get_registrations(test_id).values())
+        )
+        logger.info(f"Scheduled checks restored: {scheduled}")
+    if ANALYTICS_PREWARM:
+        prewarm_task = asyncio.create_task(prewarm_analytics())
+    if metrics.ENABLED:
+        metrics_server = metrics.MetricsServer()
+        await metrics_server.start()
+
+
+# Post the last admin digest while the bot can still send
+async def post_stop(application: Application):
+    """Send the users still waiting for the admin digest"""
+    await new_user_digest.stop()
+
+
+# Flush pending data on shutdown
+async def post_shutdown(application: Application):
+    """Write all unsaved data to disk before exit"""
+    if prewarm_task is not None:
+        prewarm_task.cancel()
+    if catalog_sync_task is not None:
+        catalog_sync_task.cancel()
+    if metrics_server is not None:
+        await metrics_server.stop()
+    await writer.stop()
+    store.close()
+    analytics_pool.shutdown()
+
+
 # Main function
 def main():
     """Start the bot"""
+    if sharding.SHARD_WORKERS and sharding.SHARD_INDEX is None:
+        run_front()
+        return
+    
     # Create application with increased timeout for slow connections
-    request = HTTPXRequest(
+    request_class = metrics.InstrumentedHTTPXRequest if metrics.ENABLED else HTTPXRequest
+    request = request_class(
         connection_pool_size=8,
         connect_timeout=60.0,  # 60 seconds to connect
         read_timeout=60.0,     # 60 seconds to read
         write_timeout=60.0,    # 60 seconds to write
         pool_timeout=60.0      # 60 seconds to get connection from pool
     )
-    application = Application.builder().token(BOT_TOKEN).request(request).build()
+    application = (
+        Application.builder()
+        .token(BOT_TOKEN)
+        .base_url(f"{BOT_API_URL}/bot")
+        .base_file_url(f"{BOT_API_URL}/file/bot")
+        .request(request)
+        .concurrent_updates(CONCURRENT_UPDATES)
+        .persistence(StatePersistence(STATE_FILE))
+        .post_init(post_init)
+        .post_stop(post_stop)
+        .post_shutdown(post_shutdown)
+        .build()
+    )
     
     # User conversation handler
     user_conv_handler = ConversationHandler(
@@ -893,6 +1178,8 @@ def main():
             WAITING_SURNAME: [MessageHandler(filters.TEXT & ~filters.COMMAND, get_surname)],
         },
         fallbacks=[CommandHandler('cancel', cancel)],
+        name='registration',
+        persistent=True,
     )
     
     # Admin conversation handler for adding tests
@@ -905,23 +1192,84 @@ def main():
             ADMIN_WAITING_CHECK_TIME: [MessageHandler(filters.TEXT & ~filters.COMMAND, admin_get_check_time)],
         },
         fallbacks=[CommandHandler('cancel', cancel)],
+        name='admin_add_test',
+        persistent=True,
     )
     
     # Add handlers
     application.add_handler(user_conv_handler)
     application.add_handler(admin_test_conv_handler)
     application.add_handler(CommandHandler('admin', admin_panel))
+    application.add_handler(CommandHandler('cache', admin_cache_stats))
+    application.add_handler(CommandHandler('export', admin_export))
+    application.add_handler(MessageHandler(
+        filters.Document.FileExtension('csv') | filters.Document.FileExtension('json'), admin_import_tests
+    ))
     application.add_handler(CallbackQueryHandler(check_subscription_callback, pattern='^check_subscription$'))
     application.add_handler(CallbackQueryHandler(admin_check_answers, pattern='^admin_check_answers$'))
     application.add_handler(CallbackQueryHandler(admin_check_specific_test, pattern='^check_'))
     application.add_handler(CallbackQueryHandler(admin_rasch_analysis, pattern='^admin_rasch_analysis$'))
     application.add_handler(CallbackQueryHandler(admin_rasch_specific_test, pattern='^rasch_'))
     application.add_handler(CallbackQueryHandler(admin_view_registrations, pattern='^admin_view_registrations$'))
+    application.add_handler(CallbackQueryHandler(admin_report_page, pattern='^page_'))
     application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_message))
     
+    # Metrics (only installed when METRICS_PORT is set)
+    if metrics.ENABLED:
+        metrics.instrument_application(application)
+        metrics.instrument_storage(store, writer)
+        metrics.add_gauge('bot_write_queue_depth', "Data changes waiting for the writer",
+                          lambda: writer.queue_depth)
+        metrics.add_gauge('bot_admin_digest_pending', "New users waiting for the next admin digest",
+                          lambda: new_user_digest.pending)
+    
     # Start the bot
-    logger.info("Bot started...")
-    application.run_polling(allowed_updates=Update.ALL_TYPES)
+    if sharding.SHARD_INDEX is not None:
+        # Worker of the multi-process mode, updates come from the front process
+        logger.info(f"Bot worker {sharding.SHARD_INDEX}/{sharding.SHARD_WORKERS} started...")
+        asyncio.run(sharding.serve_shard(application))
+    elif WEBHOOK_URL:
+        if WEBHOOK_SECRET_TOKEN is None:
+            logger.warning("WEBHOOK_SECRET_TOKEN is not set, webhook requests are not authenticated")
+        logger.info(f"Bot started (webhook on {WEBHOOK_LISTEN}:{WEBHOOK_PORT}/{WEBHOOK_PATH})...")
+        application.run_webhook(
+            listen=WEBHOOK_LISTEN,
+            port=WEBHOOK_PORT,
+            url_path=WEBHOOK_PATH,
+            webhook_url=f"{WEBHOOK_URL.rstrip('/')}/{WEBHOOK_PATH}",
+            secret_token=WEBHOOK_SECRET_TOKEN,
+            max_connections=WEBHOOK_MAX_CONNECTIONS,
+            allowed_updates=ALLOWED_UPDATES,
+        )
+    else:
+        logger.info("Bot started...")
+        application.run_polling(allowed_updates=ALLOWED_UPDATES)
+
+
+# Front process of the multi-process mode
+def run_front():
+    """Receive webhook updates and dispatch them to SHARD_WORKERS worker processes"""
+    if not WEBHOOK_URL:
+        sys.exit("SHARD_WORKERS needs webhook mode: set WEBHOOK_URL")
+    if not isinstance(store, storage.SQLiteStore):
+        sys.exit("SHARD_WORKERS needs a store shared by processes: set STORAGE_BACKEND=sqlite")
+    if WEBHOOK_SECRET_TOKEN is None:
+        logger.warning("WEBHOOK_SECRET_TOKEN is not set, webhook requests are not authenticated")
+    store.close()
+    
+    front = sharding.ShardFront(
+        os.path.abspath(__file__), sharding.SHARD_WORKERS,
+        admin_ids=ADMIN_IDS, secret_token=WEBHOOK_SECRET_TOKEN
+    )
+    front.run(
+        Bot(BOT_TOKEN, base_url=f"{BOT_API_URL}/bot", base_file_url=f"{BOT_API_URL}/file/bot"),
+        listen=WEBHOOK_LISTEN,
+        port=WEBHOOK_PORT,
+        url_path=WEBHOOK_PATH,
+        webhook_url=f"{WEBHOOK_URL.rstrip('/')}/{WEBHOOK_PATH}",
+        max_connections=WEBHOOK_MAX_CONNECTIONS,
+        allowed_updates=ALLOWED_UPDATES,
+    )
 
 
 if __name__ == '__main__':
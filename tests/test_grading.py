@@ -0,0 +1,31 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Grading engine: answer letters are compared letter by letter"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from answers import count_questions  # noqa: E402
+from grading import grade_test  # noqa: E402
+
+
+def test_latin_key():
+    graded = grade_test('1a 2b 3c 4d', {1: 'abcd', 2: '1A2b3d', 3: None})
+    assert graded.user_ids == [1, 2]
+    assert graded.scores.tolist() == [4, 2]
+    assert graded.item_rates.tolist() == [1.0, 1.0, 0.5, 0.5]
+
+
+def test_non_ascii_key():
+    # Every Cyrillic letter is its own answer, not one shared "other letter" code
+    graded = grade_test('абв', {1: 'вба', 2: '1А2Б3В', 3: 'abc'})
+    assert count_questions('1а 2б 3в') == 3
+    assert graded.scores.tolist() == [1, 3, 0]
+    assert graded.responses.tolist() == [[0, 1, 0], [1, 1, 1], [0, 0, 0]]
+
+
+def test_mixed_alphabets():
+    graded = grade_test('aбc', {1: 'aбc', 2: 'aвc', 3: 'a'})
+    assert graded.scores.tolist() == [3, 2, 1]
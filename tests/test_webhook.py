@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Webhook mode of telegram_bot.py against a stubbed Bot API
+The bot runs as "python telegram_bot.py" with WEBHOOK_URL set and
+BOT_API_URL pointing at a local tornado server that answers the Bot API
+methods it uses, so no token or network is needed.
+"""
+
+import asyncio
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+
+import httpx
+import tornado.web
+
+BOT_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'telegram_bot.py')
+
+SECRET_TOKEN = 'test-secret'
+SECRET_HEADER = 'X-Telegram-Bot-Api-Secret-Token'
+WEBHOOK_URL = 'https://bot.example.com'
+WEBHOOK_PATH = 'hook'
+USER_ID = 42
+
+# Seconds to wait for the bot to start / answer
+TIMEOUT = 60.0
+
+BOT_USER = {'id': 1, 'is_bot': True, 'first_name': 'Test', 'username': 'test_bot'}
+
+
+def free_port() -> int:
+    """A localhost port nobody listens on"""
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+class StubBotAPI(tornado.web.RequestHandler):
+    """POST /bot<token>/<method>: records the call and returns a plausible result"""
+
+    def initialize(self, calls: list):
+        self.calls = calls
+
+    def post(self, token, method):
+        params = {name: values[0].decode('utf-8') for name, values in self.request.body_arguments.items()}
+        if not params and self.request.body:
+            params = json.loads(self.request.body)
+        self.calls.append((method, params))
+
+        if method == 'getMe':
+            result = BOT_USER
+        elif method == 'getChatMember':
+            result = {'status': 'member', 'user': {'id': int(params['user_id']), 'is_bot': False, 'first_name': 'U'}}
+        elif method in ('sendMessage', 'editMessageText'):
+            chat_id = params.get('chat_id', '0')
+            result = {'message_id': 1, 'date': 0, 'text': params.get('text', ''),
+                      'chat': {'id': int(chat_id) if chat_id.lstrip('-').isdigit() else -1, 'type': 'private'}}
+        else:
+            result = True
+        self.write({'ok': True, 'result': result})
+
+
+def start_update(update_id: int) -> dict:
+    """Update JSON of a /start message from USER_ID"""
+    user = {'id': USER_ID, 'is_bot': False, 'first_name': 'Test'}
+    return {
+        'update_id': update_id,
+        'message': {
+            'message_id': update_id, 'date': 0, 'text': '/start',
+            'entities': [{'type': 'bot_command', 'offset': 0, 'length': 6}],
+            'chat': {'id': USER_ID, 'type': 'private', 'first_name': 'Test'}, 'from': user,
+        },
+    }
+
+
+async def wait_for(calls: list, predicate, process):
+    """First recorded call matching predicate, waiting for the bot"""
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + TIMEOUT
+    while loop.time() < deadline:
+        for method, params in calls:
+            if predicate(method, params):
+                return method, params
+        assert process.poll() is None, "bot exited"
+        await asyncio.sleep(0.1)
+    raise AssertionError(f"no matching Bot API call, got {[method for method, _ in calls]}")
+
+
+async def run_bot(data_dir: str) -> dict:
+    """Start the bot in webhook mode, post updates, return what was observed"""
+    calls = []
+    api_port, webhook_port = free_port(), free_port()
+    server = tornado.web.Application([(r"/bot([^/]+)/(\w+)", StubBotAPI, {'calls': calls})]).listen(
+        api_port, address='127.0.0.1'
+    )
+
+    env = dict(
+        os.environ,
+        BOT_TOKEN='1:test', BOT_API_URL=f"http://127.0.0.1:{api_port}",
+        WEBHOOK_URL=WEBHOOK_URL, WEBHOOK_PATH=WEBHOOK_PATH, WEBHOOK_LISTEN='127.0.0.1',
+        WEBHOOK_PORT=str(webhook_port), WEBHOOK_SECRET_TOKEN=SECRET_TOKEN,
+    )
+    for name in ('SHARD_WORKERS', 'SHARD_INDEX', 'METRICS_PORT', 'STORAGE_BACKEND'):
+        env.pop(name, None)
+    with open(os.path.join(data_dir, 'bot.log'), 'w') as log:
+        process = subprocess.Popen([sys.executable, os.path.abspath(BOT_SCRIPT)], cwd=data_dir, env=env,
+                                   stdout=log, stderr=subprocess.STDOUT)
+    observed = {}
+    try:
+        _, observed['set_webhook'] = await wait_for(calls, lambda method, _: method == 'setWebhook', process)
+
+        url = f"http://127.0.0.1:{webhook_port}/{WEBHOOK_PATH}"
+        async with httpx.AsyncClient() as client:
+            for _ in range(int(TIMEOUT * 10)):
+                try:
+                    await client.post(url, json={})
+                    break
+                except httpx.TransportError:
+                    await asyncio.sleep(0.1)
+            observed['wrong_secret'] = (await client.post(
+                url, json=start_update(1), headers={SECRET_HEADER: 'wrong'})).status_code
+            observed['no_secret'] = (await client.post(url, json=start_update(2))).status_code
+            observed['right_secret'] = (await client.post(
+                url, json=start_update(3), headers={SECRET_HEADER: SECRET_TOKEN})).status_code
+
+        # The bot's start handler checks the subscription and asks a new user for a name
+        _, observed['reply'] = await wait_for(
+            calls, lambda method, params: method == 'sendMessage' and params.get('chat_id') == str(USER_ID), process
+        )
+        observed['replies'] = sum(1 for method, params in calls
+                                  if method == 'sendMessage' and params.get('chat_id') == str(USER_ID))
+    finally:
+        # Keep serving the Bot API while the bot shuts down (it still sends on exit)
+        process.send_signal(signal.SIGTERM)
+        for _ in range(int(TIMEOUT * 10)):
+            if process.poll() is not None:
+                break
+            await asyncio.sleep(0.1)
+        else:
+            process.kill()
+        server.stop()
+    observed['exit_code'] = process.returncode
+    return observed
+
+
+def test_webhook_mode(tmp_path):
+    observed = asyncio.run(run_bot(str(tmp_path)))
+
+    set_webhook = observed['set_webhook']
+    assert set_webhook['url'] == f"{WEBHOOK_URL}/{WEBHOOK_PATH}"
+    assert set_webhook['secret_token'] == SECRET_TOKEN
+    assert json.loads(set_webhook['allowed_updates']) == ['message', 'callback_query']
+
+    assert observed['wrong_secret'] == 403
+    assert observed['no_secret'] == 403
+    assert observed['right_secret'] == 200
+
+    # Only the authenticated /start reached the handler
+    assert "Obuna tasdiqlandi" in observed['reply']['text']
+    assert observed['replies'] == 1
+    assert observed['exit_code'] == 0
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Compact in-memory registry of users for the JSON store
+users.json holds one dict per user; loaded as is, every user costs a dict,
+a string key and four value strings. The registry keeps a __slots__ record
+per integer user_id instead: names and surnames are interned (the same
+first names repeat across thousands of users) and registered_at is stored
+as integer seconds. Records are converted back to the users.json layout
+only when read or saved.
+"""
+
+import json
+import os
+import sys
+from datetime import datetime, timedelta
+
+USER_COLUMNS = ('name', 'surname', 'username', 'registered_at')
+
+TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+# registered_at is kept as naive seconds since this moment (no timezone conversion)
+EPOCH = datetime(1970, 1, 1)
+
+
+def _intern(value):
+    """Shared copy of a repeated string"""
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+def pack_time(value):
+    """'YYYY-MM-DD HH:MM:SS' as integer seconds (other values are kept unchanged)"""
+    if not isinstance(value, str) or len(value) != 19:
+        return value
+    try:
+        moment = datetime(int(value[0:4]), int(value[5:7]), int(value[8:10]),
+                          int(value[11:13]), int(value[14:16]), int(value[17:19]))
+    except ValueError:
+        return value
+    return (moment - EPOCH) // timedelta(seconds=1)
+
+
+def unpack_time(value):
+    """Inverse of pack_time"""
+    if not isinstance(value, int):
+        return value
+    return (EPOCH + timedelta(seconds=value)).strftime(TIME_FORMAT)
+
+
+class UserRecord:
+    """One user; name and surname are interned, registered_at is packed"""
+
+    __slots__ = USER_COLUMNS
+
+    def __init__(self, user_data: dict):
+        self.name = _intern(user_data.get('name'))
+        self.surname = _intern(user_data.get('surname'))
+        self.username = user_data.get('username')
+        self.registered_at = pack_time(user_data.get('registered_at'))
+
+    def as_dict(self) -> dict:
+        """The record in the users.json layout"""
+        return {
+            'name': self.name,
+            'surname': self.surname,
+            'username': self.username,
+            'registered_at': unpack_time(self.registered_at),
+        }
+
+
+class UserRegistry:
+    """user_id -> UserRecord, keyed by integer ids"""
+
+    def __init__(self, users: dict = None):
+        self._records = {}
+        for user_id, user_data in (users or {}).items():
+            self.add(user_id, user_data)
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def __contains__(self, user_id) -> bool:
+        return self._key(user_id) in self._records
+
+    @staticmethod
+    def _key(user_id):
+        """Integer user_id (ids arrive as int from Telegram and as str from JSON)"""
+        try:
+            return int(user_id)
+        except (TypeError, ValueError):
+            return user_id
+
+    def get(self, user_id):
+        """User record as a dict or None"""
+        record = self._records.get(self._key(user_id))
+        return record.as_dict() if record is not None else None
+
+    def full_name(self, user_id):
+        """'Name Surname' of a user or None"""
+        record = self._records.get(self._key(user_id))
+        if record is None:
+            return None
+        return f"{record.name} {record.surname}"
+
+    def add(self, user_id, user_data: dict):
+        """Create or replace a user"""
+        self._records[self._key(user_id)] = UserRecord(user_data)
+
+    def snapshot(self):
+        """Copy to save while this registry keeps changing (records are replaced, never modified)"""
+        copy = UserRegistry()
+        copy._records = dict(self._records)
+        return copy
+
+    def items(self):
+        """(user_id as str, record dict) pairs in the users.json layout"""
+        for user_id, record in self._records.items():
+            yield str(user_id), record.as_dict()
+
+    def save(self, filename: str):
+        """Write users.json one user per line, without building the whole dict first"""
+        tmp_filename = f"{filename}.tmp"
+        with open(tmp_filename, 'w', encoding='utf-8') as f:
+            f.write("{")
+            separator = "\n"
+            for user_id, user_data in self.items():
+                f.write(f"{separator}  {json.dumps(user_id)}: {json.dumps(user_data, ensure_ascii=False)}")
+                separator = ",\n"
+            f.write("\n}\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_filename, filename)
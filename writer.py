@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Single-writer persistence task
+All store mutations go through one asyncio task with a bounded queue.
+The task applies queued mutations in order, persists a whole batch with
+one write and then acknowledges every handler waiting on it. This keeps
+read-modify-write sequences safe when updates are processed concurrently.
+"""
+
+import asyncio
+import logging
+import os
+
+from storage import StoreBusy
+
+logger = logging.getLogger(__name__)
+
+# Maximum number of queued mutations before handlers wait for space
+WRITE_QUEUE_SIZE = int(os.getenv('WRITE_QUEUE_SIZE', '1000'))
+
+# Maximum number of mutations persisted with one write
+WRITE_BATCH_SIZE = int(os.getenv('WRITE_BATCH_SIZE', '200'))
+
+# Seconds a batch is retried while another process holds the store's write lock
+WRITE_LOCK_TIMEOUT = float(os.getenv('WRITE_LOCK_TIMEOUT', '30'))
+
+# First and longest pause between two attempts to take the write lock
+WRITE_RETRY_DELAY = 0.01
+WRITE_RETRY_MAX_DELAY = 0.5
+
+
+class PersistenceWriter:
+    """Routes store mutations through a single batching writer task"""
+
+    def __init__(self, store, queue_size: int = WRITE_QUEUE_SIZE, batch_size: int = WRITE_BATCH_SIZE):
+        self.store = store
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self._queue = None
+        self._task = None
+
+    async def start(self):
+        """Start the writer task"""
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        self._task = asyncio.create_task(self._run(), name="persistence-writer")
+
+    async def stop(self):
+        """Persist everything still queued and stop the writer task"""
+        if self._task is None:
+            return
+        await self._queue.put(None)
+        await self._task
+        self._task = None
+
+    @property
+    def queue_depth(self) -> int:
+        """Number of mutations waiting to be written"""
+        return self._queue.qsize() if self._queue is not None else 0
+
+    # Mutations (same signatures as the store)
+    async def add_user(self, user_id, user_data: dict):
+        """Create or replace a user record"""
+        return await self._submit(self.store.add_user, user_id, user_data)
+
+    async def add_test(self, test_id, test_data: dict):
+        """Create or replace a test"""
+        return await self._submit(self.store.add_test, test_id, test_data)
+
+    async def add_tests(self, tests: dict):
+        """Create or replace several tests at once"""
+        return await self._submit(self.store.add_tests, tests)
+
+    async def register(self, test_id, user_id, registration: dict):
+        """Register user for a test"""
+        return await self._submit(self.store.register, test_id, user_id, registration)
+
+    async def submit_answers(self, test_id, user_id, answers: str, submitted_at: str):
+        """Save user's answers for a test"""
+        return await self._submit(self.store.submit_answers, test_id, user_id, answers, submitted_at)
+
+    async def set_scores(self, test_id, scores: dict):
+        """Save scores of a test"""
+        return await self._submit(self.store.set_scores, test_id, scores)
+
+    async def _submit(self, method, *args):
+        """Queue a mutation and wait until it is persisted"""
+        if self._task is None:
+            # Writer not running (scripts) - apply directly
+            result = method(*args)
+            self.store.commit()
+            return result
+
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((method, args, future))
+        return await future
+
+    async def _run(self):
+        """Writer loop: take a batch, apply it, persist once, acknowledge"""
+        stopping = False
+        while not stopping:
+            batch = [await self._queue.get()]
+            while len(batch) < self.batch_size and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+
+            if None in batch:
+                stopping = True
+                batch = [item for item in batch if item is not None]
+
+            results = await self._write_batch_retrying(batch)
+            for future, result, error in results:
+                if future.done():
+                    continue
+                if error is not None:
+                    future.set_exception(error)
+                else:
+                    future.set_result(result)
+
+    async def _write_batch_retrying(self, batch: list) -> list:
+        """Write a batch, waiting on the event loop (not in SQLite) while another process writes"""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + WRITE_LOCK_TIMEOUT
+        delay = WRITE_RETRY_DELAY
+        while True:
+            try:
+                return self._write_batch(batch)
+            except StoreBusy as e:
+                if loop.time() >= deadline:
+                    logger.error(f"Persistence writer error: {e}")
+                    return [(future, None, e) for _, _, future in batch]
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, WRITE_RETRY_MAX_DELAY)
+
+    def _write_batch(self, batch: list) -> list:
+        """Apply a batch in one transaction and commit it, return (future, result, error) per item"""
+        results = []
+        try:
+            with self.store.transaction():
+                for method, args, future in batch:
+                    try:
+                        results.append((future, method(*args), None))
+                    except Exception as e:
+                        results.append((future, None, e))
+            self.store.commit()
+        except StoreBusy:
+            # Nothing was applied, the whole batch is retried
+            raise
+        except Exception as e:
+            logger.error(f"Persistence writer error: {e}")
+            results = [(future, None, e) for _, _, future in batch]
+        return results